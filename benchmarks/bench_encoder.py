@@ -0,0 +1,78 @@
+"""
+Benchmark the PNG encode step of the GOES pipeline.
+
+Compares the previous global-min/max np.interp encoder with the chunked
+percentile encoder in image_encoder.py on a synthetic multi-band image, and
+reports wall time and peak traced memory for each.
+
+to run: python benchmarks/bench_encoder.py --height 5000 --width 5000 --bands 3
+"""
+import os
+import sys
+import time
+import json
+import argparse
+import tempfile
+import tracemalloc
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from image_encoder import encode_array
+
+
+def legacy_encode(array, png_path):
+    """Encoder used by goes_manager before the chunked stage."""
+    image_array = np.interp(array, (array.min(), array.max()), (0, 255)).astype(np.uint8)
+    img = Image.fromarray(np.moveaxis(image_array, 0, -1))
+    img.save(png_path, format="PNG")
+
+
+def synthetic_image(bands, height, width, dtype="float32", nodata_fraction=0.2, seed=0):
+    """Random band-first image with a NoData (NaN or 0) border on the left."""
+    rng = np.random.default_rng(seed)
+    array = (rng.random((bands, height, width), dtype=np.float32) * 250).astype(dtype)
+    border = int(width * nodata_fraction)
+    array[:, :, :border] = np.nan if np.dtype(dtype).kind == "f" else 0
+    return array
+
+
+def measure(func, *args):
+    """Return (seconds, peak_bytes) for one call of func."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    func(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def run(bands=3, height=2000, width=2000, dtype="float32"):
+    array = synthetic_image(bands, height, width, dtype)
+    nodata = None if array.dtype.kind == "f" else 0
+    results = {"bands": bands, "height": height, "width": width, "dtype": dtype}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        png_path = os.path.join(tmp, "bench.png")
+        if array.dtype.kind == "f":  # legacy encoder cannot handle NaN
+            legacy = np.nan_to_num(array)
+        else:
+            legacy = array
+        results["legacy_seconds"], results["legacy_peak_bytes"] = measure(legacy_encode, legacy, png_path)
+        results["chunked_seconds"], results["chunked_peak_bytes"] = measure(
+            lambda: encode_array(array, png_path, nodata=nodata))
+
+    results["peak_ratio"] = results["legacy_peak_bytes"] / results["chunked_peak_bytes"]
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--bands", type=int, default=3)
+    parser.add_argument("--height", type=int, default=2000)
+    parser.add_argument("--width", type=int, default=2000)
+    parser.add_argument("--dtype", default="float32", choices=["float32", "uint8"])
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.bands, args.height, args.width, args.dtype), indent=2))
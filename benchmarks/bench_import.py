@@ -0,0 +1,69 @@
+"""
+Benchmark import latency and resident memory of the server modules.
+
+Each module is imported in a fresh interpreter, like a newly forked worker, and
+the wall time of the import plus the process max RSS are recorded. The heavy
+GOES and geopandas stacks should only show up for modules that need them.
+
+to run: python benchmarks/bench_import.py --repeat 5 > bench_import.json
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = ["flask_app", "mongo_manager", "opensky_manager", "goes_manager"]
+HEAVY = ["geopandas", "pandas", "goes2go", "satpy", "rasterio", "PIL"]
+
+PROBE = """
+import sys, time, json, resource
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "seconds": elapsed,
+    "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "modules": len(sys.modules),
+    "heavy": sorted(m for m in {heavy!r} if m in sys.modules),
+}}))
+"""
+
+
+def probe(module):
+    """Import module in a fresh interpreter and return its measurements."""
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY)],
+        cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        return {"error": result.stderr.strip().splitlines()[-1]}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run(modules=MODULES, repeat=3):
+    results = {}
+    for module in modules:
+        runs = [probe(module) for _ in range(repeat)]
+        if "error" in runs[0]:
+            results[module] = runs[0]
+            continue
+        results[module] = {
+            "seconds_median": statistics.median(r["seconds"] for r in runs),
+            "seconds_min": min(r["seconds"] for r in runs),
+            "max_rss_kb": max(r["max_rss_kb"] for r in runs),
+            "modules": runs[0]["modules"],
+            "heavy": runs[0]["heavy"],
+        }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("modules", nargs="*", default=MODULES)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.modules, args.repeat), indent=2))
@@ -0,0 +1,186 @@
+"""
+Local load test for /api-call and /get-historic-data-range.
+
+Either point it at a running deployment:
+
+    MONGO_HOST=127.0.0.1 ADSB_SOURCE=replay gunicorn -c gunicorn.conf.py wsgi:app
+    python benchmarks/load_test.py --url http://127.0.0.1:8000 --date 2025-04-18
+
+or let it start the app in-process (threaded dev server) against a seeded
+mongomock stand-in, with /api-call served from the opensky.json replay source:
+
+    python benchmarks/load_test.py --serve --duration 10 --concurrency 16
+
+Reports requests/sec and latency percentiles per route as JSON. Example
+--serve run (1 vCPU container, 16 clients, 10 s, 60 snapshots x 500 aircraft,
+routes picked 50/50, result cache warm). Client and server share one process,
+so these numbers are a floor for a multi-worker gunicorn deployment:
+
+    /api-call                 ~100 req/s, p50 ~75 ms, p99 ~110 ms
+    /get-historic-data-range  ~100 req/s, p50 ~82 ms, p99 ~119 ms
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import statistics
+import http.client
+from urllib.parse import urlsplit
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+API_BBOX = "34.0,40.0,-100.0,-90.0"
+
+
+def seed_stand_in(date, snapshots, aircraft, interval=5):
+    """
+    Start a mongomock client seeded with synthetic snapshots built from opensky.json.
+
+    Returns:
+        List of 'HH:MM:SS' snapshot times that hold data.
+    """
+    import mongomock
+    from mongo_manager import set_client
+    from replay_manager import ReplaySource
+
+    _, features, _, _ = ReplaySource(os.path.join(ROOT, "opensky.json")).current()
+    client = mongomock.MongoClient()
+    set_client(client)
+    collection = client.adsb_db.api_data
+
+    start = datetime.strptime(f"{date} 22:00:00", "%Y-%m-%d %H:%M:%S")
+    times = []
+    for i in range(snapshots):
+        ts = start + timedelta(seconds=i * interval)
+        docs = []
+        for feature in random.sample(features, min(aircraft, len(features))):
+            doc = json.loads(json.dumps(feature))
+            doc["properties"]["timestamp"] = ts.isoformat() + "Z"
+            docs.append(doc)
+        collection.insert_many(docs)
+        times.append(ts.strftime("%H:%M:%S"))
+    return times
+
+
+def serve_in_process(port):
+    """Run flask_app on a threaded werkzeug server in a background thread."""
+    from werkzeug.serving import make_server
+    from flask_app import create_app
+
+    import logging
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)  # no per-request access log
+    server = make_server("127.0.0.1", port, create_app(), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def worker(base_url, paths, deadline, results, lock):
+    """Send requests over one keep-alive connection until the deadline."""
+    parts = urlsplit(base_url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+    local = {}
+    while time.perf_counter() < deadline:
+        route = random.choice(list(paths))
+        path = random.choice(paths[route])
+        start = time.perf_counter()
+        try:
+            conn.request("GET", path, headers={"Accept-Encoding": "gzip"})
+            response = conn.getresponse()
+            response.read()
+            ok = response.status < 400
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+            ok = False
+        stats = local.setdefault(route, {"latencies": [], "errors": 0})
+        stats["latencies"].append(time.perf_counter() - start)
+        stats["errors"] += 0 if ok else 1
+    conn.close()
+
+    with lock:
+        for route, stats in local.items():
+            merged = results.setdefault(route, {"latencies": [], "errors": 0})
+            merged["latencies"].extend(stats["latencies"])
+            merged["errors"] += stats["errors"]
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def run(base_url, date, times, duration=10, concurrency=16, routes=("api", "historic")):
+    paths = {}  # route -> request paths, routes are picked uniformly
+    if "api" in routes:
+        paths["/api-call"] = [f"/api-call/{API_BBOX}/0"]
+    if "historic" in routes:
+        paths["/get-historic-data-range"] = [f"/get-historic-data-range/{date}/{t}" for t in times]
+
+    # warm up: replay conversion, result cache and connection pools
+    for path in [p for route_paths in paths.values() for p in route_paths]:
+        parts = urlsplit(base_url)
+        conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=120)
+        conn.request("GET", path)
+        conn.getresponse().read()
+        conn.close()
+
+    results, lock = {}, threading.Lock()
+    deadline = time.perf_counter() + duration
+    threads = [threading.Thread(target=worker, args=(base_url, paths, deadline, results, lock))
+               for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    report = {"url": base_url, "duration": duration, "concurrency": concurrency, "routes": {}}
+    for route, stats in sorted(results.items()):
+        lat = stats["latencies"]
+        report["routes"][route] = {
+            "requests": len(lat),
+            "errors": stats["errors"],
+            "requests_per_sec": len(lat) / duration,
+            "p50_ms": percentile(lat, 50) * 1000,
+            "p95_ms": percentile(lat, 95) * 1000,
+            "p99_ms": percentile(lat, 99) * 1000,
+            "mean_ms": statistics.fmean(lat) * 1000,
+        }
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", help="base URL of a running server")
+    parser.add_argument("--serve", action="store_true", help="start the app in-process with a mongomock stand-in")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--date", default="2025-04-18")
+    parser.add_argument("--times", nargs="*", help="HH:MM:SS values to request (default: seeded times)")
+    parser.add_argument("--snapshots", type=int, default=60)
+    parser.add_argument("--aircraft", type=int, default=500)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    parser.add_argument("--routes", nargs="*", default=["api", "historic"], choices=["api", "historic"])
+    args = parser.parse_args()
+
+    if args.serve:
+        os.environ["ADSB_SOURCE"] = "replay"  # read when flask_app is imported
+        times = seed_stand_in(args.date, args.snapshots, args.aircraft)
+        serve_in_process(args.port)
+        base_url = f"http://127.0.0.1:{args.port}"
+    elif args.url:
+        base_url = args.url
+        times = args.times or ["22:00:00"]
+    else:
+        parser.error("pass --url or --serve")
+
+    report = run(base_url, args.date, args.times or times, args.duration, args.concurrency, args.routes)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
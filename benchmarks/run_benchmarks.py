@@ -0,0 +1,249 @@
+"""
+Benchmark suite for the ingestion, query and rendering hot paths.
+
+Times each case on synthetic data (see synthetic.py) and writes the results as
+JSON so runs from different commits can be compared:
+
+    python benchmarks/run_benchmarks.py --scale small --output bench_output.json
+    python benchmarks/run_benchmarks.py --compare old.json new.json
+
+Mongo cases run against MONGO_HOST/MONGO_PORT in a throwaway database
+(adsb_bench) if a server answers, otherwise against mongomock if installed,
+otherwise they are reported as skipped.
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import statistics
+import subprocess
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import synthetic
+
+# aircraft per snapshot, days of stored history
+SCALES = {
+    "small": {"aircraft": [1000], "days": [1], "image": [(3, 1000, 1000)]},
+    "medium": {"aircraft": [1000, 10000], "days": [1, 7], "image": [(3, 2000, 2000)]},
+    "large": {"aircraft": [1000, 10000, 100000], "days": [1, 30, 90], "image": [(3, 2000, 2000), (3, 5000, 5000)]},
+}
+
+BENCH_DB = "adsb_bench"
+
+
+def timeit(func, repeat=5, setup=None):
+    """Run func repeat times (after setup, untimed) and return the durations."""
+    durations = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def record(results, name, params, durations, **extra):
+    results.append({
+        "name": name,
+        "params": params,
+        "repeat": len(durations),
+        "median_s": statistics.median(durations),
+        "min_s": min(durations),
+        "max_s": max(durations),
+        **extra,
+    })
+    print(f"{name:<32} {json.dumps(params):<40} median {statistics.median(durations) * 1000:10.2f} ms",
+          file=sys.stderr)
+
+
+class StubApi:
+    """OpenSky stand-in returning a pre-built response."""
+
+    def __init__(self, response):
+        from opensky_api import OpenSkyStates
+        self.response = response
+        self.states_cls = OpenSkyStates
+
+    def get_states(self, bbox=()):
+        return self.states_cls(dict(self.response, states=list(self.response["states"])))
+
+
+def bench_opensky(results, scale, repeat):
+    from opensky_manager import get_os_states, SnapshotStore, RateBudget
+    import opensky_manager
+
+    # do not let the shared rate budget throttle the benchmark
+    opensky_manager.rate_budget = RateBudget(rate=1e9, burst=10 ** 9)
+    for n in scale["aircraft"]:
+        api = StubApi(synthetic.synthetic_response(n))
+        bbox = [30.0, 40.0, -100.0, -90.0]  # one tile, the stub ignores it
+        durations = timeit(lambda: get_os_states(bbox, api=api, snapshots=SnapshotStore()), repeat)
+        record(results, "get_os_states_conversion", {"aircraft": n}, durations)
+
+
+def bench_timestamps(results, scale, repeat):
+    from utils import convert_timestamp, normalize_timestamps
+
+    for n in scale["aircraft"]:
+        values = synthetic.synthetic_timestamps(n)
+        durations = timeit(lambda: [convert_timestamp(v) for v in values], repeat)
+        record(results, "convert_timestamp_batch", {"values": n}, durations)
+        durations = timeit(lambda: normalize_timestamps(values), repeat)
+        record(results, "normalize_timestamps", {"values": n}, durations)
+
+
+def mongo_backend(kind):
+    """Return (client, backend name) or (None, reason)."""
+    if kind in ("auto", "live"):
+        import pymongo
+        import mongo_manager
+        client = pymongo.MongoClient(mongo_manager.MONGO_HOST, mongo_manager.MONGO_PORT,
+                                     serverSelectionTimeoutMS=1000)
+        try:
+            client.admin.command("ping")
+            return client, "live"
+        except Exception as e:
+            if kind == "live":
+                return None, f"no MongoDB server: {e}"
+    try:
+        import mongomock
+    except ImportError:
+        return None, "no MongoDB server and mongomock not installed"
+    return mongomock.MongoClient(), "mongomock"
+
+
+def bench_mongo(results, scale, repeat, kind):
+    import mongo_manager
+
+    client, backend = mongo_backend(kind)
+    if client is None:
+        results.append({"name": "mongo", "skipped": backend})
+        print(f"mongo benchmarks skipped: {backend}", file=sys.stderr)
+        return
+
+    mongo_manager.set_client(client)
+    mongo_manager.MONGO_DB = BENCH_DB
+    collection = mongo_manager.get_collection()
+
+    for n in scale["aircraft"]:
+        docs = synthetic.synthetic_features(n)
+
+        def insert():
+            collection.insert_many([dict(d) for d in docs])  # insert_many adds _id
+
+        durations = timeit(insert, repeat, setup=lambda: collection.drop())
+        record(results, "mongo_insert_many", {"docs": n, "backend": backend}, durations)
+
+    for days in scale["days"]:
+        collection.drop()
+        for docs in synthetic.synthetic_snapshots(days):
+            collection.insert_many(docs)
+        params = {"days": days, "docs": collection.estimated_document_count(), "backend": backend}
+
+        for name, func in [
+            ("mongo_distinct_days", lambda: mongo_manager.get_distinct_days_from_adsb()),
+            ("mongo_distinct_times", lambda: mongo_manager.get_distinct_times_from_adsb("2025-04-18")),
+            ("mongo_window_query", lambda: mongo_manager.get_data_window_for_date("2025-04-18", "12:00:00")),
+        ]:
+            try:
+                durations = timeit(func, repeat)
+            except Exception as e:  # e.g. aggregation operator missing in mongomock
+                results.append({"name": name, "params": params, "skipped": str(e)})
+                continue
+            record(results, name, params, durations)
+
+    collection.drop()
+
+
+def bench_encode(results, scale, repeat):
+    import tempfile
+    from bench_encoder import synthetic_image
+    from image_encoder import encode_array
+
+    with tempfile.TemporaryDirectory() as tmp:
+        png_path = os.path.join(tmp, "bench.png")
+        for bands, height, width in scale["image"]:
+            array = synthetic_image(bands, height, width)
+            durations = timeit(lambda: encode_array(array, png_path), max(1, repeat // 2))
+            record(results, "goes_png_encode", {"bands": bands, "height": height, "width": width}, durations)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old_path, new_path):
+    """Print the median ratio new/old for every case present in both runs."""
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+
+    def key(r):
+        return r["name"], json.dumps(r.get("params", {}), sort_keys=True)
+
+    old_cases = {key(r): r for r in old["results"] if "median_s" in r}
+    print(f"{'case':<72} {'old ms':>10} {'new ms':>10} {'ratio':>7}")
+    for r in new["results"]:
+        if "median_s" not in r or key(r) not in old_cases:
+            continue
+        before = old_cases[key(r)]["median_s"]
+        label = f"{r['name']} {json.dumps(r['params'], sort_keys=True)}"
+        print(f"{label:<72} {before * 1000:10.2f} {r['median_s'] * 1000:10.2f} {r['median_s'] / before:7.2f}")
+
+
+SUITES = ["opensky", "timestamps", "mongo", "encode"]
+
+
+def run(scale_name="small", suites=SUITES, repeat=5, mongo="auto"):
+    scale = SCALES[scale_name]
+    results = []
+    if "opensky" in suites:
+        bench_opensky(results, scale, repeat)
+    if "timestamps" in suites:
+        bench_timestamps(results, scale, repeat)
+    if "mongo" in suites:
+        bench_mongo(results, scale, repeat, mongo)
+    if "encode" in suites:
+        bench_encode(results, scale, repeat)
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "scale": scale_name,
+            "repeat": repeat,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+        },
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scale", default="small", choices=list(SCALES))
+    parser.add_argument("--suites", nargs="*", default=SUITES, choices=SUITES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--mongo", default="auto", choices=["auto", "live", "mock"])
+    parser.add_argument("--output", default="bench_output.json")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+    else:
+        report = run(args.scale, args.suites, args.repeat, args.mongo)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"wrote {args.output}", file=sys.stderr)
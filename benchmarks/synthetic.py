@@ -0,0 +1,91 @@
+"""
+Synthetic data generators for the benchmarks, scaled up from opensky.json.
+"""
+import os
+import sys
+import json
+import random
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from opensky_manager import STATE_FIELDS, state_vectors_to_geojson
+
+# continental US, where the recorded sample comes from
+US_BBOX = [21.0, 50.0, -136.0, -61.0]
+
+_template = None
+
+
+def template_states():
+    """Recorded state vectors from opensky.json (list of lists)."""
+    global _template
+    if _template is None:
+        with open(os.path.join(ROOT, "opensky.json")) as f:
+            _template = json.load(f)["states"]
+    return _template
+
+
+def synthetic_states(n, seed=0, bbox=US_BBOX):
+    """
+    n OpenSky state vectors (lists in STATE_FIELDS order) resampled from the
+    recording, each with a unique icao24 and a position spread over bbox.
+    """
+    rng = random.Random(seed)
+    template = template_states()
+    states = []
+    for i in range(n):
+        state = list(rng.choice(template))
+        state[0] = f"{i:06x}"
+        state[5] = round(rng.uniform(bbox[2], bbox[3]), 4)  # longitude
+        state[6] = round(rng.uniform(bbox[0], bbox[1]), 4)  # latitude
+        states.append(state)
+    return states
+
+
+def synthetic_response(n, seed=0, time=1738361582):
+    """A /states/all style response dict with n aircraft."""
+    return {"time": time, "states": synthetic_states(n, seed)}
+
+
+def synthetic_features(n, seed=0, time=1738361582):
+    """n GeoJSON features as produced by get_os_states."""
+    dict_list = [dict(zip(STATE_FIELDS, s)) for s in synthetic_states(n, seed)]
+    return json.loads(state_vectors_to_geojson(dict_list, time))["features"]
+
+
+def synthetic_timestamps(n, seed=0):
+    """Mixed timestamps as seen by convert_timestamp: unix, space-separated, ISO, junk."""
+    rng = random.Random(seed)
+    base = datetime(2025, 4, 18)
+    values = []
+    for _ in range(n):
+        dt = base + timedelta(seconds=rng.randrange(90 * 86400))
+        kind = rng.random()
+        if kind < 0.3:
+            values.append(int(dt.timestamp()))
+        elif kind < 0.6:
+            values.append(dt.strftime("%Y-%m-%d %H:%M:%S"))
+        elif kind < 0.95:
+            values.append(dt.isoformat() + "Z")
+        else:
+            values.append(rng.choice([None, "not a time", "2025-13-01 00:00:00", 3.5e9]))
+    return values
+
+
+def synthetic_snapshots(days, snapshots_per_day=24, aircraft=200, start="2025-04-18", seed=0):
+    """
+    Yield lists of stored documents, one list per snapshot, covering days of
+    history. Each document has the shape inserted by /api-call with save_data=1.
+    """
+    features = synthetic_features(aircraft, seed)
+    start_dt = datetime.strptime(start, "%Y-%m-%d")
+    step = timedelta(seconds=86400 // snapshots_per_day)
+    for i in range(days * snapshots_per_day):
+        ts = (start_dt + i * step).isoformat() + "Z"
+        docs = []
+        for feature in features:
+            properties = dict(feature["properties"], timestamp=ts)
+            docs.append({"type": "Feature", "geometry": feature["geometry"], "properties": properties})
+        yield docs
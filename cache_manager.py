@@ -0,0 +1,320 @@
+import os
+import zlib
+import threading
+import bisect
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+try:
+    import fcntl
+except ImportError:  # Windows, renders are only serialized within a process
+    fcntl = None
+
+
+# default disk budget for rendered composites (bytes), override with env var
+DEFAULT_MAX_BYTES = int(os.environ.get("COMPOSITE_CACHE_MAX_BYTES", 2 * 1024 ** 3))
+
+# ABI CONUS scans are 5 minutes apart, so a cached scan within half an interval
+# of the requested time is the scan GOES would return as nearest
+NEAREST_SCAN_TOLERANCE = timedelta(minutes=2, seconds=30)
+
+TIME_FORMAT = "%Y%m%d_%H%M%S"
+PNG_SUFFIX = "_merc.png"
+# renders are serialized across worker processes with this many lock files
+RENDER_LOCK_STRIPES = 16
+
+
+class CompositeEntry:
+    """A rendered composite in the cache directory."""
+
+    __slots__ = ("time_string", "scan_time", "product", "filename", "size", "last_access")
+
+    def __init__(self, time_string, product, filename, size, last_access):
+        self.time_string = time_string
+        self.scan_time = datetime.strptime(time_string, TIME_FORMAT)
+        self.product = product
+        self.filename = filename
+        self.size = size
+        self.last_access = last_access
+
+    def __repr__(self):
+        return f"CompositeEntry({self.filename!r}, size={self.size})"
+
+
+class CompositeCache:
+    """
+    Size-bounded index of rendered composite PNGs.
+
+    The directory is scanned on first use and lookups go to the in-memory index.
+    Worker processes share the directory, so a hit is confirmed with a stat of the
+    file, a miss checks the disk for another worker's render, and the directory is
+    rescanned before evicting so the budget covers every worker's composites. The
+    access time of each file records use, which keeps one LRU order across workers.
+    Entries are evicted (files deleted) once the total size exceeds max_bytes or an
+    entry has not been read for max_age.
+
+    Args:
+        cache_dir (str): Directory that holds the composite PNGs.
+        product (str): GOES product the composites were rendered from.
+        max_bytes (int): Disk budget for all composites in the directory.
+        max_age (timedelta): Optional idle time after which an entry is evicted.
+    """
+
+    def __init__(self, cache_dir, product=None, max_bytes=DEFAULT_MAX_BYTES, max_age=None):
+        self.cache_dir = cache_dir
+        self.product = product
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+
+        self._entries = OrderedDict()  # time_string -> CompositeEntry, LRU first
+        self._times = []  # sorted scan times for nearest lookup
+        self._total_bytes = 0
+        self._loaded = False
+
+        self._lock = threading.RLock()
+        self._render_locks = {}  # stripe -> RenderLock
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def load(self):
+        """Build the index from the files already in the cache directory."""
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            self._rebuild()
+            self._evict()
+
+    def refresh(self):
+        """
+        Re-read the cache directory. Other worker processes render into and
+        evict from the same directory, so the index can be out of date.
+        """
+        with self._lock:
+            self._loaded = True
+            self._rebuild()
+
+    def get(self, time_string):
+        """
+        Return the cached PNG filename for a scan time string (YYYYmmdd_HHMMSS),
+        or None if that scan has not been rendered.
+        """
+        self.load()
+        with self._lock:
+            entry = self._entries.get(time_string)
+            if entry is not None and not self._touch(entry):
+                entry = None  # evicted by another worker
+            if entry is None:
+                entry = self._adopt(time_string)  # rendered by another worker
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry.filename
+
+    def nearest(self, target_time, tolerance=NEAREST_SCAN_TOLERANCE):
+        """
+        Return the cached PNG filename for the scan closest to target_time, or None
+        if no cached scan lies within tolerance.
+        """
+        self.load()
+        with self._lock:
+            entry = self._nearest_entry(target_time, tolerance)
+            if entry is None:
+                self._rebuild()
+                entry = self._nearest_entry(target_time, tolerance)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry.filename
+
+    def add(self, time_string, png_path):
+        """Register a freshly rendered PNG and evict to stay within budget."""
+        self.load()
+        with self._lock:
+            # the budget covers the directory, including other workers' renders
+            self._rebuild()
+            entry = self._entries.get(time_string)
+            if entry is None:
+                size = os.path.getsize(png_path)
+                entry = CompositeEntry(time_string, self.product, os.path.basename(png_path),
+                                       size, datetime.now().timestamp())
+                self._insert(entry)
+            self._evict(keep=time_string)
+        return entry.filename
+
+    def render_lock(self, time_string):
+        """
+        Lock shared by every thread and worker process rendering the same scan, so
+        concurrent requests for a scan that is not cached yet render it only once.
+        """
+        with self._lock:
+            stripe = zlib.crc32(time_string.encode()) % RENDER_LOCK_STRIPES
+            lock = self._render_locks.get(stripe)
+            if lock is None:
+                lock = RenderLock(os.path.join(self.cache_dir, f".render-{stripe}.lock"))
+                self._render_locks[stripe] = lock
+            return lock
+
+    def stats(self):
+        """Return a dict with the index size and hit/miss/eviction counters."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _insert(self, entry):
+        old = self._entries.pop(entry.time_string, None)
+        if old is not None:
+            self._total_bytes -= old.size
+        else:
+            bisect.insort(self._times, entry.scan_time)
+        self._entries[entry.time_string] = entry
+        self._total_bytes += entry.size
+
+    def _rebuild(self):
+        """Replace the index with the composites currently on disk."""
+        self._entries.clear()
+        self._times = []
+        self._total_bytes = 0
+        if not os.path.isdir(self.cache_dir):
+            return
+
+        found = []
+        for dir_entry in os.scandir(self.cache_dir):
+            name = dir_entry.name
+            if not name.endswith(PNG_SUFFIX):
+                continue
+            time_string = name[: -len(PNG_SUFFIX)]
+            try:
+                stat = dir_entry.stat()
+                entry = CompositeEntry(time_string, self.product, name, stat.st_size, stat.st_atime)
+            except (OSError, ValueError):
+                continue  # not one of ours, or removed while scanning
+            found.append(entry)
+
+        # access times are kept on disk (see _touch), so every worker sees one LRU order
+        for entry in sorted(found, key=lambda e: e.last_access):
+            self._insert(entry)
+
+    def _adopt(self, time_string):
+        """Index a composite another worker wrote since the last scan."""
+        filename = time_string + PNG_SUFFIX
+        try:
+            stat = os.stat(os.path.join(self.cache_dir, filename))
+            entry = CompositeEntry(time_string, self.product, filename, stat.st_size, stat.st_atime)
+        except (OSError, ValueError):
+            return None
+        self._insert(entry)
+        self._touch(entry)
+        return entry
+
+    def _nearest_entry(self, target_time, tolerance):
+        while True:
+            idx = bisect.bisect_left(self._times, target_time)
+            candidates = self._times[max(idx - 1, 0): idx + 1]
+            if not candidates:
+                return None
+
+            best = min(candidates, key=lambda t: abs(t - target_time))
+            if abs(best - target_time) > tolerance:
+                return None
+
+            entry = self._entries[best.strftime(TIME_FORMAT)]
+            if self._touch(entry):
+                return entry
+            # evicted by another worker, try the next closest scan
+
+    def _touch(self, entry):
+        """Mark entry as used, in memory and as the file's access time. False if the file is gone."""
+        now = datetime.now().timestamp()
+        path = os.path.join(self.cache_dir, entry.filename)
+        try:
+            os.utime(path, (now, os.stat(path).st_mtime))
+        except FileNotFoundError:
+            self._forget(entry)
+            return False
+        except OSError:
+            pass  # read-only directory, the in-memory order still applies
+        entry.last_access = now
+        self._entries.move_to_end(entry.time_string)
+        return True
+
+    def _forget(self, entry):
+        """Drop entry from the index without touching the file."""
+        del self._entries[entry.time_string]
+        self._times.pop(bisect.bisect_left(self._times, entry.scan_time))
+        self._total_bytes -= entry.size
+
+    def _remove(self, entry):
+        self._forget(entry)
+        self.evictions += 1
+        try:
+            os.remove(os.path.join(self.cache_dir, entry.filename))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print("Error removing cached composite", entry.filename, e)
+
+    def _evict(self, keep=None):
+        """Drop idle entries, then least recently used ones until under budget."""
+        if self.max_age is not None:
+            cutoff = datetime.now().timestamp() - self.max_age.total_seconds()
+            for entry in list(self._entries.values()):
+                if entry.last_access >= cutoff:
+                    break  # LRU order, everything after this is newer
+                if entry.time_string != keep:
+                    self._remove(entry)
+
+        for entry in list(self._entries.values()):
+            if self._total_bytes <= self.max_bytes:
+                break
+            if entry.time_string != keep:
+                self._remove(entry)
+
+
+class RenderLock:
+    """
+    Thread lock plus an exclusive flock on a file in the cache directory, so
+    only one thread in one worker process renders a given scan at a time.
+
+    Args:
+        path (str): Lock file, shared by scans that hash to the same stripe.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._thread_lock = threading.Lock()
+        self._file = None
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        if fcntl is not None:
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                self._file = open(self.path, "a")
+                fcntl.flock(self._file, fcntl.LOCK_EX)
+            except OSError as e:
+                print("Could not lock composite render, continuing unlocked: ", e)
+                self._close()
+        return self
+
+    def __exit__(self, *exc):
+        self._close()
+        self._thread_lock.release()
+
+    def _close(self):
+        if self._file is not None:
+            try:
+                fcntl.flock(self._file, fcntl.LOCK_UN)
+            finally:
+                self._file.close()
+                self._file = None
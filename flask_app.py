@@ -1,42 +1,267 @@
-from flask import Flask, render_template, jsonify, send_from_directory
-import geopandas as gpd
-from opensky_manager import get_os_states
-from goes_manager import get_latest_image
-from mongo_manager import get_distinct_times_from_adsb, get_distinct_days_from_adsb, get_data_window_for_date
-from utils import convert_timestamp
-import pymongo
+from flask import Flask, Blueprint, current_app, render_template, jsonify, send_from_directory, request, make_response, g, abort
+from opensky_manager import get_os_states, tile_grid, MAX_REGION_TILES
+from mongo_manager import get_distinct_times_from_adsb, get_distinct_days_from_adsb, get_data_window_for_date, LazyCollection
+from utils import normalize_timestamps
+from result_cache import ResultCache
+from replay_manager import FixtureSource, ReplaySource
+from live_cache import CoalescingCache
+from metrics import REGISTRY, REQUEST_SECONDS, RESPONSE_BYTES, timed, count_rows
+from profiler import ProfileStore, PROFILE_ENABLED, PROFILE_THRESHOLD, PROFILE_TOKEN, PROFILE_HEADER
 import json
 import os 
+import gzip
+import sys
+import time
+import cProfile
+from datetime import datetime, timedelta, timezone
+from functools import wraps, partial
+from werkzeug.http import generate_etag
 
-host = "127.0.0.1"
-port = 27017
+try:
+    import brotli
+except ImportError:  # optional, gzip only
+    brotli = None
 
-# mongodb connection
-client = pymongo.MongoClient(host, port)
-db = client.adsb_db
-collection = db.api_data
+# mongodb connection, opened per process on first use (see mongo_manager.get_client)
+collection = LazyCollection()
 
-
-app = Flask(__name__)
+bp = Blueprint("adsb", __name__)
 
 IMAGE_FOLDER = os.path.join(os.getcwd(), 'composites')
 
+# composites are named by scan time and never change once written
+IMAGE_MAX_AGE = 365 * 24 * 3600
+# history for a past day never changes, let clients keep it for a day
+HISTORIC_MAX_AGE = 24 * 3600
+# smaller JSON bodies are not worth compressing
+COMPRESS_MIN_BYTES = 1024
+# seconds of history returned per playback step
+HISTORIC_WINDOW_SECONDS = 1
+
+# static test data for /get-data, parsed once
+fixture_source = FixtureSource()
+
+# ADSB_SOURCE=replay serves recorded OpenSky dumps instead of the live API (load tests)
+replay_source = ReplaySource() if os.environ.get("ADSB_SOURCE") == "replay" else None
+
+
+
+def fetch_live_states(bbox):
+    """Live states for a rounded bbox from OpenSky, or the replay source if enabled."""
+    if replay_source is not None:
+        return replay_source.get_states(bbox)
+    return get_os_states(bbox)
+
+
+# identical (or contained) bboxes within the OpenSky update interval share one fetch
+live_cache = CoalescingCache(fetch_live_states)
+
+# serialized historic windows, optionally shared by workers through a sqlite file;
+# set RESULT_CACHE_PATH with several workers, otherwise current-day windows are only
+# reused for RESULT_CACHE_TODAY_TTL seconds
+result_cache = ResultCache(store_path=os.environ.get("RESULT_CACHE_PATH"))
+
+# cProfile dumps of slow requests, see profiler.py (PROFILING / PROFILE_TOKEN config)
+profile_store = ProfileStore()
+
+
+def historic_policy(date=None, **kwargs):
+    """
+    Cache policy for historic routes: (max_age, last_modified).
+    Past days are complete, so they are cacheable and last modified at the end
+    of the day. The current day (or no day) must be revalidated every time.
+    """
+    if date is None:
+        return 0, None
+    try:
+        day = datetime.strptime(date, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    except ValueError:
+        return 0, None
+
+    end_of_day = day + timedelta(days=1)
+    if end_of_day > datetime.now(timezone.utc):
+        return 0, None
+    return HISTORIC_MAX_AGE, end_of_day
+
+
+def cached_variant(response, name, make):
+    """
+    ETag or encoded body for response. Views serving a cached body set
+    response.variant_cache so these are computed once per body, not per request.
+    """
+    variant_cache = getattr(response, "variant_cache", None)
+    return variant_cache(name, make) if variant_cache is not None else make()
+
+
+def conditional(policy=historic_policy):
+    """
+    Add a weak ETag, Last-Modified and Cache-Control to a view's response and
+    answer matching If-None-Match / If-Modified-Since requests with 304.
+    The ETag is weak so it stays valid for the compressed representations.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+
+            max_age, last_modified = policy(**kwargs)
+            response.cache_control.public = True
+            if max_age:
+                response.cache_control.max_age = max_age
+            else:
+                response.cache_control.no_cache = True
+            if last_modified is not None:
+                response.last_modified = last_modified
+
+            response.set_etag(cached_variant(response, "etag", lambda: generate_etag(response.get_data())),
+                              weak=True)
+            return response.make_conditional(request)
+        return wrapper
+    return decorator
+
+
+def cache_metrics():
+    """Cache counters for /metrics, read from each cache's stats() at scrape time."""
+    stats = {"historic": result_cache.stats(), "live": live_cache.stats()}
+    stats["live"]["hits"] += stats["live"]["contained_hits"]
+    if "goes_manager" in sys.modules:  # don't import the GOES stack just to report on it
+        stats["composites"] = sys.modules["goes_manager"].composite_cache.stats()
+
+    def samples(field):
+        return {(("cache", name),): s[field] for name, s in stats.items() if field in s}
+
+    return [
+        ("adsb_cache_hits_total", "counter", "Cache hits", samples("hits")),
+        ("adsb_cache_misses_total", "counter", "Cache misses", samples("misses")),
+        ("adsb_cache_coalesced_total", "counter", "Requests that waited on an in-flight fetch", samples("coalesced")),
+        ("adsb_cache_entries", "gauge", "Entries held by the cache", samples("entries")),
+        ("adsb_cache_bytes", "gauge", "Bytes held by the cache", samples("bytes")),
+    ]
+
+
+REGISTRY.add_collector(cache_metrics)
+
+
+@bp.before_app_request
+def start_timer():
+    REGISTRY.start_flusher()  # no-op unless METRICS_DIR is set, once per worker
+    g.request_start = time.perf_counter()
+
+
+# registered before compress_response, so it runs after it and sees the final size
+@bp.after_app_request
+def record_request(response):
+    """Request latency and payload size per route template."""
+    start = g.pop("request_start", None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        REQUEST_SECONDS.observe(time.perf_counter() - start, route=route,
+                                method=request.method, status=response.status_code)
+        if response.content_length is not None:
+            RESPONSE_BYTES.observe(response.content_length, route=route)
+    return response
+
+
+def profile_threshold():
+    """
+    Latency threshold for keeping a profile of this request, or None to not
+    profile it. A request carrying the PROFILE_TOKEN header is always kept.
+    """
+    config = current_app.config
+    token = config["PROFILE_TOKEN"]
+    if token and request.headers.get(PROFILE_HEADER) == token:
+        return 0.0
+    if config["PROFILING"]:
+        return config["PROFILE_THRESHOLD"]
+    return None
+
+
+@bp.before_app_request
+def start_profile():
+    if request.endpoint in ("adsb.list_profiles", "adsb.get_profile"):
+        return
+    threshold = profile_threshold()
+    if threshold is None:
+        return
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError:  # another profiler is active on this interpreter
+        return
+    g.profile = (profile, threshold, time.perf_counter())
+
+
+# runs after compress_response, before record_request
+@bp.after_app_request
+def stop_profile(response):
+    """Keep the profile if the request was slower than the threshold."""
+    profiled = g.pop("profile", None)
+    if profiled is None:
+        return response
+    profile, threshold, start = profiled
+    profile.disable()
+    duration = time.perf_counter() - start
+    if duration >= threshold:
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        try:
+            name = profile_store.save(profile, request.method, route, duration)
+            response.headers["X-Profile-Id"] = name
+        except OSError as e:
+            print("Could not save request profile: ", e)
+    return response
+
+
+@bp.teardown_app_request
+def discard_profile(exc):
+    # a request that raised never reaches stop_profile
+    profiled = g.pop("profile", None)
+    if profiled is not None:
+        profiled[0].disable()
+
 
-@app.route("/") # serve "index" page with iframe
+@bp.after_app_request
+def compress_response(response):
+    """Brotli or gzip encode JSON responses when the client accepts it."""
+    if (response.status_code != 200
+            or response.direct_passthrough
+            or response.mimetype != "application/json"
+            or "Content-Encoding" in response.headers):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_BYTES:
+        return response
+
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        response.set_data(cached_variant(response, "br", lambda: brotli.compress(data, quality=5)))
+        response.headers["Content-Encoding"] = "br"
+    elif accepted["gzip"]:
+        response.set_data(cached_variant(response, "gzip", lambda: gzip.compress(data, compresslevel=6)))
+        response.headers["Content-Encoding"] = "gzip"
+
+    return response
+
+
+@bp.route("/") # serve "index" page with iframe
 def iframe_page():
     return render_template("iframe.html")
 
-@app.route("/map_iframe") # URL for this route in iframe of index page
+@bp.route("/map_iframe") # URL for this route in iframe of index page
 def map_iframe():
     return render_template("map_iframe.html")
 
-@app.route("/get-data") # load from file for testing to reduce API calls
+@bp.route("/get-data") # load from file for testing to reduce API calls
 def get_data():
-    gdf = gpd.read_file("dataframe.geojson")
-    return gdf.to_json()
+    return current_app.response_class(fixture_source.body(), mimetype="application/json")
 
-@app.route("/get-image-filename/<img_type>")
+@bp.route("/get-image-filename/<img_type>")
 def get_test_image(img_type):
+    # goes2go/satpy/rasterio take seconds to import, only load them when needed
+    from goes_manager import get_latest_image
 
     latest_img = get_latest_image(img_type)
 
@@ -45,14 +270,18 @@ def get_test_image(img_type):
 
     return latest_img
 
-@app.route("/get-latest-image/<path:filename>")
+@bp.route("/get-latest-image/<path:filename>")
 def serve_image(filename):
-    return send_from_directory(IMAGE_FOLDER, filename)
+    response = send_from_directory(IMAGE_FOLDER, filename, max_age=IMAGE_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
 
-@app.route("/api-call/<bbox>/<save_data>")
+@bp.route("/api-call/<bbox>/<save_data>")
 def get_states(bbox, save_data): 
     """
     Fetch states within the given bounding box, enforcing a size limit.
+    Boxes larger than one upstream tile (10 x 10 degrees) are fetched as tiles.
     bbox: list where: min_lat, max_lat, min_lng, max_lng
     save_data: int, 1 to insert, 0 otherwise
     """
@@ -65,60 +294,161 @@ def get_states(bbox, save_data):
         min_lng = round(min_lng, 4)
         max_lng = round(max_lng, 4)
 
-        # Define max allowed bounding box size
-        MAX_LAT_DIFF = 10.0  # Maximum latitude range
-        MAX_LNG_DIFF = 10.0  # Maximum longitude range
+        rounded_bbox = [min_lat, max_lat, min_lng, max_lng]
 
-        if (max_lat - min_lat) > MAX_LAT_DIFF or (max_lng - min_lng) > MAX_LNG_DIFF:
+        # Define max allowed bounding box size
+        n_lat, n_lng = tile_grid(rounded_bbox)
+        if n_lat * n_lng > MAX_REGION_TILES:
             return {"error": "Bounding box size exceeds limit"}, 400
         
-        rounded_bbox = [min_lat, max_lat, min_lng, max_lng]
         # print("Rounded BBOX:", rounded_bbox)  # Debugging output
-        json_states = get_os_states(rounded_bbox)
+        json_states = live_cache.get(rounded_bbox)
+
+        if not json_states: # upstream failed and there is no snapshot to fall back on
+            return {"error": "Failed to retrieve data"}, 503
 
-        if not json_states: # if api returns none
-            return {"error": "Failed to retrieve data"}, 200
+        # a cached snapshot is shared by many requests, store it only once
+        snapshot = live_cache.claim(rounded_bbox) if save_data == 1 else None
 
-        if save_data == 1:
+        if snapshot:
             try:
-                states_in = json.loads(json_states)
-                for feature in states_in["features"]:
-                    if "properties" in feature and "timestamp" in feature["properties"]:
-                        ts = feature["properties"]["timestamp"]
-                        feature["properties"]["timestamp"] = convert_timestamp(ts)
+                states_in = json.loads(snapshot)
+                if states_in.get("stale") or states_in.get("partial"):
+                    # stale aircraft were stored when fresh, and an incomplete
+                    # region must not be stored as a complete snapshot
+                    return json_states
+                stamped = [f for f in states_in["features"]
+                           if "properties" in f and "timestamp" in f["properties"]]
+                normalized, invalid = normalize_timestamps(f["properties"]["timestamp"] for f in stamped)
+                for feature, ts in zip(stamped, normalized):
+                    feature["properties"]["timestamp"] = ts
+                if invalid:
+                    print(f"Could not convert {len(invalid)} of {len(stamped)} timestamps")
 
-                collection.insert_many(states_in["features"])
+                with timed("db_insert", "api_data"):
+                    collection.insert_many(states_in["features"])
+                count_rows("db_insert", len(states_in["features"]), "api_data")
+
+                # cached windows for the inserted day are now incomplete
+                inserted_days = {f["properties"]["timestamp"][:10] for f in states_in["features"]
+                                 if isinstance(f.get("properties", {}).get("timestamp"), str)}
+                for day in inserted_days:
+                    result_cache.invalidate_date(day)
             except Exception as e:
                 print("Error inserting to database", e)
 
         return json_states
 
-    except ValueError:
+    except (ValueError, OverflowError):
         return {"error": "Invalid bounding box format"}, 400
 
-@app.route("/populate-dates")
+@bp.route("/populate-dates")
+@conditional()
 def populate_dates():
     """Populate list with available dates for ADS-B data """
     # list of available dates
     available_dates = get_distinct_days_from_adsb()
     return {"datesList": available_dates}
 
-@app.route("/get-date-range/<date>")
+@bp.route("/get-date-range/<date>")
+@conditional()
 def get_date_range(date):
     # distinct timestamps for that date
     distinct_times = get_distinct_times_from_adsb(date)
     return jsonify(distinct_times)
 
-@app.route("/get-historic-data-range/<date>/<start_time>")
+@bp.route("/get-historic-data-range/<date>/<start_time>")
+@conditional()
 def get_historic_data_range(date, start_time):
     # Query data in a time window, return as JSON
     print("from client: ", date, start_time)
-    data = get_data_window_for_date(date, start_time)  
-    for d in data:
-        d["_id"] = str(d["_id"])
+    key = (date, start_time, HISTORIC_WINDOW_SECONDS, None)
+    body = result_cache.get(key)
+
+    if body is None:
+        data = get_data_window_for_date(date, start_time, HISTORIC_WINDOW_SECONDS)
+        for d in data:
+            d["_id"] = str(d["_id"])
+        with timed("json_serialization", "historic"):
+            body = current_app.json.dumps(data).encode()
+        result_cache.put(key, body)
+
+    response = current_app.response_class(body, mimetype="application/json")
+    # ETag and compressed bodies are kept next to the cached body
+    response.variant_cache = partial(result_cache.variant, key, body)
+    return response
+
+@bp.route("/cache-stats")
+def cache_stats():
+    """Hit/miss counters for the server-side caches"""
+    return {"historic": result_cache.stats(), "live": live_cache.stats()}
+
+@bp.route("/metrics")
+def metrics():
+    """Prometheus scrape endpoint, merged over all workers when METRICS_DIR is set."""
+    return current_app.response_class(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+def profiles_allowed():
+    """Profiles are only exposed when profiling is configured (and the token sent, if one is set)."""
+    config = current_app.config
+    if config["PROFILE_TOKEN"]:
+        return request.headers.get(PROFILE_HEADER) == config["PROFILE_TOKEN"]
+    return config["PROFILING"]
+
+@bp.route("/profiles")
+def list_profiles():
+    """Stored request profiles, newest first."""
+    if not profiles_allowed():
+        abort(404)
+    return jsonify(profile_store.list())
+
+@bp.route("/profiles/<name>")
+def get_profile(name):
+    """Download a .prof file, or a pstats summary with ?format=text."""
+    if not profiles_allowed():
+        abort(404)
+    if request.args.get("format") == "text":
+        summary = profile_store.summary(name)
+        if summary is None:
+            abort(404)
+        return current_app.response_class(summary, mimetype="text/plain")
+
+    path = profile_store.path(name)
+    if path is None:
+        abort(404)
+    return send_from_directory(profile_store.directory, name, as_attachment=True)
+
+
+
+def create_app(config=None):
+    """
+    Application factory.
+
+    Creates the Flask app and registers the routes. Database clients are opened
+    lazily per process, so the factory is safe to call before a worker fork
+    (e.g. Gunicorn --preload) or once per worker.
+
+    Args:
+        config (dict): Optional Flask config overrides.
+
+    Returns:
+        Flask app
+    """
+    app = Flask(__name__)
+    app.config.from_mapping(
+        PROFILING=PROFILE_ENABLED,
+        PROFILE_THRESHOLD=PROFILE_THRESHOLD,
+        PROFILE_TOKEN=PROFILE_TOKEN,
+    )
+    if config:
+        app.config.from_mapping(config)
+    app.register_blueprint(bp)
+    return app
+
 
-    return jsonify(data)
+app = create_app()
 
 
 if __name__ == "__main__":
-    app.run(debug=True)
\ No newline at end of file
+    # development server; use wsgi.py with gunicorn.conf.py in production
+    app.run(debug=True, threaded=True)
\ No newline at end of file
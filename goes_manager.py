@@ -5,17 +5,25 @@ import os
 from datetime import datetime
 import rasterio
 from rasterio.warp import calculate_default_transform, reproject, Resampling
-from PIL import Image 
+from rasterio.enums import ColorInterp
+from rasterio.windows import Window
 import numpy as np
+from image_encoder import CHUNK_ROWS, sample_step, band_limits, stretch_bands, save_png
+from cache_manager import CompositeCache
+from metrics import timed
 
 
-def get_latest_image(img_type):
+dl_dir = r"C:\Users\danpa\data"
+comps_dir = r"C:\Users\danpa\Projects\aa_capstone\py_project\composites"
+
+desired_product = "ABI-L1b-RadC"
+desired_ds = "colorized_ir_clouds"
 
-    dl_dir = r"C:\Users\danpa\data"
-    comps_dir = r"C:\Users\danpa\Projects\aa_capstone\py_project\composites"
+# index of rendered PNGs in comps_dir, evicts old composites to a disk budget
+composite_cache = CompositeCache(comps_dir, product=desired_product)
 
-    desired_product = "ABI-L1b-RadC"
-    desired_ds = "colorized_ir_clouds"
+
+def get_latest_image(img_type):
 
     G = GOES(satellite=19, product=desired_product, domain='C')
 
@@ -23,14 +31,22 @@ def get_latest_image(img_type):
 
     if img_type == "live":
         try:
-            ds = G.latest(return_as = "filelist")
+            with timed("goes_download", "live"):
+                ds = G.latest(return_as = "filelist")
         except FileNotFoundError:
             print("Image not available")
             return "Image not available"
     else: # 2025-04-18_221215
         try:
             target_time = datetime.strptime(img_type, "%Y-%m-%d_%H%M%S")
-            ds = G.nearesttime(target_time, return_as = "filelist")
+
+            # skip the S3 listing if the nearest scan is already rendered
+            cached = composite_cache.nearest(target_time)
+            if cached:
+                return cached
+
+            with timed("goes_download", "historic"):
+                ds = G.nearesttime(target_time, return_as = "filelist")
         except FileNotFoundError:
             print("Image not available")
             return "Image not available"
@@ -39,28 +55,54 @@ def get_latest_image(img_type):
 
     time_string = file_date.strftime("%Y%m%d_%H%M%S")
 
-    png_output_file = os.path.join(comps_dir, time_string + "_merc.png")
-
     # check if we already processed the file and return if we did
-    if os.path.exists(png_output_file):
+    cached = composite_cache.get(time_string)
+    if cached:
         print("Already downloaded and processed file")
-        return os.path.basename(png_output_file)
+        return cached
+
+    # only one request (in any worker) renders a given scan, the rest wait and reuse it
+    with composite_cache.render_lock(time_string):
+        cached = composite_cache.get(time_string)
+        if cached:
+            return cached
+
+        return render_composite(ds, time_string)
+
+
+def render_composite(ds, time_string):
+    """
+    Download, reproject and encode one GOES scan as a PNG in comps_dir.
+
+    Args:
+        ds (DataFrame): goes2go file list for the scan.
+        time_string (str): Scan start time as 'YYYYmmdd_HHMMSS'.
+
+    Returns:
+        Filename of the PNG, or an error string if processing failed.
+    """
+    png_output_file = os.path.join(comps_dir, time_string + "_merc.png")
 
     filenames = ds["file"].to_list()
 
     filenames = [os.path.join(dl_dir, fn) for fn in filenames]
 
     try:
-        scn = Scene(reader = "abi_l1b", filenames = filenames)
+        with timed("satpy_load"):
+            scn = Scene(reader = "abi_l1b", filenames = filenames)
 
-        scn.load([desired_ds])    
+            scn.load([desired_ds])    
     except Exception as e:
         print("An error occurred processing the files: ", e)
         return("An error occurred processing the files")
 
-    savename = os.path.join(comps_dir, time_string + ".tif")
+    # intermediates are per process, the PNG is renamed into place once complete
+    # so other workers never pick up a partial file
+    tmp_prefix = os.path.join(comps_dir, f".{time_string}.{os.getpid()}")
+    savename = tmp_prefix + ".tif"
 
-    scn.save_dataset(desired_ds, filename = savename)
+    with timed("geotiff_write"):
+        scn.save_dataset(desired_ds, filename = savename)
 
     print(f"Saved dataset to: {savename}")
 
@@ -68,10 +110,10 @@ def get_latest_image(img_type):
     dst_crs = "EPSG:3857" 
 
     input_file = savename
-    output_file = os.path.join(comps_dir, time_string + "_merc" + ".tif")
+    output_file = tmp_prefix + "_merc.tif"
 
     # can we pass xarray objects instead of writing to file? 
-    with rasterio.open(input_file) as src:
+    with timed("reprojection"), rasterio.open(input_file) as src:
         transform, width, height = calculate_default_transform(
         src.crs, dst_crs, src.width, src.height, *src.bounds
         )
@@ -96,21 +138,45 @@ def get_latest_image(img_type):
                     resampling=Resampling.bilinear
                 )
 
-    with rasterio.open(output_file) as src:
-        image_array = src.read() 
-        image_array = np.interp(image_array, (image_array.min(), image_array.max()), (0, 255)).astype(np.uint8)
-        img = Image.fromarray(np.moveaxis(image_array, 0, -1))
-        img.save(png_output_file, format="PNG")
+    with timed("png_encode"), rasterio.open(output_file) as src:
+        encode_geotiff(src, tmp_prefix + ".png.part")
+    os.replace(tmp_prefix + ".png.part", png_output_file)
 
     print(f"Saved PNG image to: {png_output_file}")
     os.remove(input_file) # delete tif
     os.remove(output_file)
 
-    return os.path.basename(png_output_file)
+    return composite_cache.add(time_string, png_output_file)
+
 
+def encode_geotiff(src, png_path, chunk_rows=CHUNK_ROWS):
+    """
+    Stretch an open rasterio dataset into an RGBA PNG without reading it whole.
 
+    Stretch limits (see band_limits) come from a decimated read, then the bands
+    are stretched in row windows. The uint8 RGBA composites satpy writes keep
+    their colours. Pixels masked by NoData or an alpha band become transparent.
 
+    Args:
+        src (DatasetReader): Open rasterio dataset.
+        png_path (str): Output PNG path.
+        chunk_rows (int): Rows read per window.
+    """
+    bands = [i for i, ci in enumerate(src.colorinterp, start=1) if ci != ColorInterp.alpha]
 
+    step = sample_step(src.height, src.width)
+    sample_shape = (-(-src.height // step), -(-src.width // step))
 
+    limits = []
+    for i in bands:
+        sample = src.read(i, out_shape=sample_shape)
+        valid = src.read_masks(i, out_shape=sample_shape) > 0
+        limits.append(band_limits(sample, valid))
 
+    def read_chunk(row_start, row_stop):
+        window = Window(0, row_start, src.width, row_stop - row_start)
+        data = src.read(bands, window=window)
+        valid = np.all(src.read_masks(bands, window=window) > 0, axis=0)
+        return data, valid
 
+    save_png(stretch_bands(read_chunk, src.height, src.width, limits, chunk_rows), png_path)
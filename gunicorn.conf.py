@@ -0,0 +1,63 @@
+"""
+Gunicorn settings for the production deployment (gunicorn -c gunicorn.conf.py wsgi:app).
+
+Every setting can be overridden with an environment variable. The routes mostly
+wait on OpenSky, MongoDB and S3, so each worker runs a thread pool (gthread) and
+the GIL is released while requests block on I/O.
+"""
+import os
+import tempfile
+import multiprocessing
+
+bind = os.environ.get("WEB_BIND", "0.0.0.0:8000")
+
+# processes, bound by CPU for JSON serialization and GOES rendering
+workers = int(os.environ.get("WEB_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+# request threads per process, bound by upstream I/O
+threads = int(os.environ.get("WEB_THREADS", 8))
+worker_class = os.environ.get("WEB_WORKER_CLASS", "gthread")
+
+# GOES renders on a cache miss can take close to a minute
+timeout = int(os.environ.get("WEB_TIMEOUT", 120))
+graceful_timeout = 30
+keepalive = 5
+
+# recycle workers now and then to cap memory growth from rendering
+max_requests = int(os.environ.get("WEB_MAX_REQUESTS", 5000))
+max_requests_jitter = 500
+
+# import the app once in the master and fork, clients are opened after fork
+preload_app = os.environ.get("WEB_PRELOAD", "1") == "1"
+
+accesslog = "-"
+
+# one OpenSky rate budget for all workers instead of one per worker; set before
+# the app is imported (preload) or the workers are forked
+os.environ.setdefault("OPENSKY_RATE_PATH", os.path.join(tempfile.gettempdir(), "adsb_opensky_rate"))
+# workers write their metrics here and /metrics merges them, so a scrape that
+# lands on any worker sees totals for the whole server
+os.environ.setdefault("METRICS_DIR", os.path.join(tempfile.gettempdir(), "adsb_metrics"))
+
+
+def on_starting(server):
+    # counters start from zero with a new master
+    from metrics import clear_directory
+    clear_directory(os.environ["METRICS_DIR"])
+
+
+def worker_exit(server, worker):
+    # runs in the worker, write the last requests before it goes
+    from metrics import REGISTRY
+    REGISTRY.flush()
+
+
+def child_exit(server, worker):
+    # runs in the master, keep the exited worker's counts (max_requests recycling)
+    from metrics import mark_process_dead
+    mark_process_dead(worker.pid, os.environ["METRICS_DIR"])
+
+
+def post_fork(server, worker):
+    # never share a MongoClient created in the master with a worker
+    from mongo_manager import reset_client
+    reset_client()
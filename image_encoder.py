@@ -0,0 +1,137 @@
+import os
+import numpy as np
+from PIL import Image
+
+
+# rows stretched per step, bounds the float32 scratch buffer to chunk_rows * width
+CHUNK_ROWS = int(os.environ.get("ENCODER_CHUNK_ROWS", 512))
+
+# percentile stretch for radiance/float bands, clips outliers instead of using
+# the global min/max; uint8 bands are already enhanced and keep their values
+LOW_PERCENTILE = 2.0
+HIGH_PERCENTILE = 98.0
+
+# pixels per band used to estimate the percentiles
+MAX_SAMPLES = 1_000_000
+
+
+def sample_step(height, width, max_samples=MAX_SAMPLES):
+    """Stride along both axes that leaves at most ~max_samples pixels."""
+    return max(1, int(np.ceil(np.sqrt(height * width / max_samples))))
+
+
+def valid_mask(data, nodata=None):
+    """Boolean mask of pixels that are finite and not equal to nodata."""
+    if data.dtype.kind == "f":
+        mask = np.isfinite(data)
+    else:
+        mask = np.ones(data.shape, dtype=bool)
+    if nodata is not None and not np.isnan(nodata):
+        mask &= data != nodata
+    return mask
+
+
+def band_limits(sample, valid, low=LOW_PERCENTILE, high=HIGH_PERCENTILE):
+    """
+    Stretch limits for one band. uint8 bands (e.g. satpy's colour-enhanced
+    composites) are already display values and get the identity (0, 255), so
+    only NoData changes them. Other dtypes get a percentile stretch.
+
+    Args:
+        sample (ndarray): 2D (possibly decimated) band values.
+        valid (ndarray): Boolean mask of the same shape, False for NoData.
+        low (float): Lower percentile mapped to 0.
+        high (float): Upper percentile mapped to 255.
+
+    Returns:
+        Tuple (lo, hi) of floats with hi > lo.
+    """
+    if sample.dtype == np.uint8:
+        return 0.0, 255.0
+
+    values = sample[valid]
+    if values.size == 0:
+        return 0.0, 1.0
+
+    lo, hi = np.percentile(values, (low, high))
+    if hi <= lo:  # flat band
+        hi = lo + 1.0
+    return float(lo), float(hi)
+
+
+def stretch_bands(read_chunk, height, width, limits, chunk_rows=CHUNK_ROWS):
+    """
+    Stretch bands to uint8 chunk by chunk and append an alpha channel.
+
+    Args:
+        read_chunk (callable): read_chunk(row_start, row_stop) returning a tuple
+            (data, valid) where data is (bands, rows, width) and valid is a
+            (rows, width) boolean mask, False where any band is NoData.
+        height (int): Number of rows in the image.
+        width (int): Number of columns in the image.
+        limits (list): (lo, hi) per band, see band_limits.
+        chunk_rows (int): Rows processed per step.
+
+    Returns:
+        uint8 array of shape (height, width, bands + 1), last channel is alpha.
+    """
+    count = len(limits)
+    out = np.zeros((height, width, count + 1), dtype=np.uint8)
+    scratch = np.empty((min(chunk_rows, height), width), dtype=np.float32)
+
+    for row_start in range(0, height, chunk_rows):
+        row_stop = min(row_start + chunk_rows, height)
+        data, valid = read_chunk(row_start, row_stop)
+        buf = scratch[: row_stop - row_start]
+        dest = out[row_start:row_stop]
+
+        for b, (lo, hi) in enumerate(limits):
+            np.copyto(buf, data[b], casting="unsafe")
+            np.subtract(buf, lo, out=buf)
+            np.multiply(buf, 255.0 / (hi - lo), out=buf)
+            np.clip(buf, 0, 255, out=buf)
+            np.nan_to_num(buf, copy=False)  # NaN NoData, masked by alpha anyway
+            np.copyto(dest[..., b], buf, casting="unsafe")
+
+        alpha = dest[..., count]
+        alpha[valid] = 255
+        dest[~valid] = 0  # clear colour under transparent pixels
+
+    return out
+
+
+def encode_array(array, png_path, nodata=None, chunk_rows=CHUNK_ROWS):
+    """
+    Write a (bands, rows, cols) array as an RGBA (or LA) PNG, stretched per
+    band with band_limits. The input array is not modified.
+
+    Args:
+        array (ndarray): Band-first image, any numeric dtype.
+        png_path (str): Output PNG path.
+        nodata (float): NoData value, NaN is always treated as NoData.
+        chunk_rows (int): Rows processed per step.
+
+    Returns:
+        png_path
+    """
+    count, height, width = array.shape
+    step = sample_step(height, width)
+
+    limits = []
+    for b in range(count):
+        sample = array[b, ::step, ::step]
+        limits.append(band_limits(sample, valid_mask(sample, nodata)))
+
+    def read_chunk(row_start, row_stop):
+        data = array[:, row_start:row_stop]
+        return data, valid_mask(data, nodata).all(axis=0)
+
+    save_png(stretch_bands(read_chunk, height, width, limits, chunk_rows), png_path)
+    return png_path
+
+
+def save_png(rgba, png_path):
+    """Save an (rows, cols, channels) uint8 array, last channel is alpha."""
+    if rgba.shape[-1] not in (2, 4):  # LA or RGBA
+        raise ValueError(f"Unsupported number of channels: {rgba.shape[-1]}")
+    Image.fromarray(rgba).save(png_path, format="PNG")
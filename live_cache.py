@@ -0,0 +1,159 @@
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+
+
+# OpenSky state vectors update every 5 s (authenticated) to 10 s (anonymous)
+LIVE_TTL = float(os.environ.get("LIVE_CACHE_TTL", 5))
+MAX_ENTRIES = 64
+
+
+class _Flight:
+    """A fetch in progress that other requests for the same bbox wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+
+class CoalescingCache:
+    """
+    Short-TTL cache for live GeoJSON keyed by the rounded bbox.
+
+    A fresh entry for the same bbox is returned as is. A fresh entry for a larger
+    bbox that contains the request is filtered down to it. Concurrent misses for
+    the same bbox share a single upstream fetch. Failed fetches (None) are not
+    cached.
+
+    Each stored snapshot can be claimed once with claim(), so a snapshot shared
+    by many requests is written to the database only once.
+
+    Args:
+        fetch (callable): fetch(bbox) returning a GeoJSON string or None.
+        ttl (float): Seconds an entry stays fresh.
+        max_entries (int): Entries kept, least recently stored dropped first.
+        clock (callable): Monotonic clock in seconds, for tests.
+    """
+
+    def __init__(self, fetch, ttl=LIVE_TTL, max_entries=MAX_ENTRIES, clock=time.monotonic):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+
+        self._entries = OrderedDict()  # bbox tuple -> [stored_at, json string, parsed or None, claimed]
+        self._flights = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.contained_hits = 0
+        self.coalesced = 0
+        self.misses = 0
+
+    def get(self, bbox):
+        """Return GeoJSON for bbox [min_lat, max_lat, min_lng, max_lng]."""
+        key = tuple(bbox)
+        leader = False
+
+        with self._lock:
+            self._expire()
+
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.hits += 1
+                return entry[1]
+
+            container = self._find_container(key)
+            flight = self._flights.get(key)
+            if container is not None:
+                self.contained_hits += 1
+            elif flight is not None:
+                self.coalesced += 1
+            else:
+                flight = _Flight()
+                self._flights[key] = flight
+                self.misses += 1
+                leader = True
+
+        if container is not None:
+            return self._filter(container, key)
+
+        if not leader:
+            flight.done.wait()
+            return flight.result
+
+        try:
+            flight.result = self.fetch(list(bbox))
+        finally:
+            with self._lock:
+                if flight.result:
+                    self._entries[key] = [self.clock(), flight.result, None, False]
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                del self._flights[key]
+            flight.done.set()
+        return flight.result
+
+    def claim(self, bbox):
+        """
+        Return the full GeoJSON of the fresh snapshot covering bbox (the same bbox
+        or a containing one) the first time it is claimed, None afterwards or if
+        nothing covers bbox.
+        """
+        key = tuple(bbox)
+        with self._lock:
+            self._expire()
+            entry = self._entries.get(key) or self._find_container(key)
+            if entry is None or entry[3]:
+                return None
+            entry[3] = True
+            return entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "contained_hits": self.contained_hits,
+                "coalesced": self.coalesced,
+                "misses": self.misses,
+            }
+
+    def _expire(self):
+        cutoff = self.clock() - self.ttl
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if entry[0] >= cutoff:
+                break
+            del self._entries[key]
+
+    def _find_container(self, key):
+        min_lat, max_lat, min_lng, max_lng = key
+        for other, entry in self._entries.items():
+            if other[0] <= min_lat and max_lat <= other[1] and other[2] <= min_lng and max_lng <= other[3]:
+                return entry
+        return None
+
+    def _filter(self, entry, key):
+        """Clip a cached larger bbox to key, keeping top-level members like 'stale'."""
+        if entry[2] is None:
+            entry[2] = json.loads(entry[1])
+        parsed = entry[2]
+
+        min_lat, max_lat, min_lng, max_lng = key
+        features = []
+        for feature in parsed["features"]:
+            props = feature.get("properties", {})
+            lat, lng = props.get("latitude"), props.get("longitude")
+            if lat is not None and lng is not None and min_lat <= lat <= max_lat and min_lng <= lng <= max_lng:
+                features.append(feature)
+
+        clipped = dict(parsed)
+        clipped["features"] = features
+        return json.dumps(clipped)
@@ -0,0 +1,314 @@
+import os
+import json
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows, metrics are per process
+    fcntl = None
+
+
+# seconds, Prometheus defaults plus room for GOES renders
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# bytes
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+# directory shared by the worker processes of one server (gunicorn.conf.py sets
+# one); each worker writes its series there and /metrics merges them
+METRICS_DIR = os.environ.get("METRICS_DIR")
+# how often a worker writes its series to METRICS_DIR (seconds)
+FLUSH_INTERVAL = float(os.environ.get("METRICS_FLUSH_INTERVAL", 1.0))
+
+ARCHIVE_FILE = "archive.json"
+LOCK_FILE = "metrics.lock"
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ""
+    escaped = ",".join('{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+                       for k, v in pairs)
+    return "{" + escaped + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter, optionally split by labels."""
+
+    type = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels.get(n, "") for n in self.labelnames), 0)
+
+    def family(self):
+        """(name, type, help, {label pairs: value}), the form collectors return."""
+        with self._lock:
+            items = list(self._values.items())
+        return self.name, self.type, self.help, {tuple(zip(self.labelnames, k)): v for k, v in items}
+
+
+class Histogram:
+    """Cumulative-bucket histogram, optionally split by labels."""
+
+    type = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [0] * (len(self.buckets) + 3)
+            series[idx] += 1  # idx == len(buckets) is the +Inf bucket
+            series[-2] += value
+            series[-1] += 1
+
+    def count(self, **labels):
+        series = self._values.get(tuple(labels.get(n, "") for n in self.labelnames))
+        return series[-1] if series else 0
+
+    def family(self):
+        """(name, type, help, {label pairs: [bucket counts..., sum, count]})."""
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._values.items()]
+        return self.name, self.type, self.help, {tuple(zip(self.labelnames, k)): v for k, v in items}
+
+
+class Registry:
+    """
+    Metrics of this process, rendered in the Prometheus text format.
+
+    With directory set (and fcntl available), every worker process writes its
+    series to <directory>/metrics-<pid>.json once per flush_interval, and render()
+    merges the files of all workers: counters and histograms are summed, gauges
+    are summed over live workers. When a worker exits, mark_process_dead folds
+    its counters and histograms into archive.json, so recycled workers do not
+    look like counter resets.
+
+    Args:
+        directory (str): Optional directory shared by the workers of one server.
+        flush_interval (float): Seconds between writes of this worker's series.
+        pid (int): Process id used for the file name, for tests.
+    """
+
+    def __init__(self, directory=None, flush_interval=FLUSH_INTERVAL, pid=None):
+        self.directory = directory if fcntl is not None else None
+        self.flush_interval = flush_interval
+        self.pid = pid
+        self.metrics = []
+        self.collectors = []
+        self._flusher_pid = None
+        self._flush_lock = threading.Lock()
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, func):
+        """
+        func() returns a list of (name, type, help, {labels: value}) tuples, read at
+        scrape time, e.g. counters kept by a cache's stats().
+        """
+        self.collectors.append(func)
+
+    def families(self):
+        """This process's metrics as {name: (type, help, {label pairs: value})}."""
+        families = {}
+        for name, type_, help, samples in [m.family() for m in self.metrics] + \
+                [f for func in self.collectors for f in func()]:
+            families[name] = (type_, help, samples)
+        return families
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        if self.directory:
+            self.flush()
+            families = self._merged()
+        else:
+            families = self.families()
+        buckets = {m.name: m.buckets for m in self.metrics if m.type == "histogram"}
+
+        lines = []
+        for name, (type_, help, samples) in families.items():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {type_}")
+            for labels, value in sorted(samples.items()):
+                if type_ != "histogram":
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                    continue
+                cumulative = 0
+                for bound, n in zip(buckets[name] + (float("inf"),), value):
+                    cumulative += n
+                    le = (("le", _format_value(bound)),)
+                    lines.append(f"{name}_bucket{_format_labels(labels + le)} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(value[-2])}")
+                lines.append(f"{name}_count{_format_labels(labels)} {value[-1]}")
+        return "\n".join(lines) + "\n"
+
+    def start_flusher(self):
+        """Start this worker's background flush thread (once per process, after fork)."""
+        pid = os.getpid()
+        if not self.directory or self._flusher_pid == pid:
+            return
+        with self._flush_lock:
+            if self._flusher_pid == pid:
+                return
+            self._flusher_pid = pid
+            threading.Thread(target=self._flush_loop, name="metrics-flush", daemon=True).start()
+
+    def flush(self):
+        """Write this process's series to its file in the shared directory."""
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        pid = self.pid or os.getpid()
+        _write_json(os.path.join(self.directory, f"metrics-{pid}.json"), _dump(self.families()))
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except OSError as e:
+                print("Could not write metrics: ", e)
+
+    def _merged(self):
+        with _locked(self.directory, fcntl.LOCK_SH if fcntl else None):
+            merged = _load(os.path.join(self.directory, ARCHIVE_FILE))
+            for name in os.listdir(self.directory):
+                if name.startswith("metrics-") and name.endswith(".json"):
+                    _merge(merged, _load(os.path.join(self.directory, name)))
+        return merged
+
+
+def mark_process_dead(pid, directory=METRICS_DIR):
+    """
+    Fold an exited worker's counters and histograms into the archive and drop
+    its file (call from the gunicorn master, child_exit). Its gauges are gone
+    with the process.
+    """
+    if not directory or fcntl is None:
+        return
+    path = os.path.join(directory, f"metrics-{pid}.json")
+    if not os.path.exists(path):
+        return
+    with _locked(directory, fcntl.LOCK_EX):
+        archive = _load(os.path.join(directory, ARCHIVE_FILE))
+        dead = {name: family for name, family in _load(path).items() if family[0] != "gauge"}
+        _merge(archive, dead)
+        _write_json(os.path.join(directory, ARCHIVE_FILE), _dump(archive))
+        os.remove(path)
+
+
+def clear_directory(directory=METRICS_DIR):
+    """Remove the files of a previous server run (call when the master starts)."""
+    if not directory or not os.path.isdir(directory):
+        return
+    for name in os.listdir(directory):
+        if name.endswith(".json"):
+            os.remove(os.path.join(directory, name))
+
+
+def _merge(into, families):
+    for name, (type_, help, samples) in families.items():
+        if name not in into:
+            into[name] = (type_, help, {})
+        target = into[name][2]
+        for labels, value in samples.items():
+            current = target.get(labels)
+            if current is None:
+                target[labels] = list(value) if isinstance(value, list) else value
+            elif isinstance(value, list):
+                target[labels] = [a + b for a, b in zip(current, value)]
+            else:
+                target[labels] = current + value
+
+
+def _dump(families):
+    return {name: [type_, help, [[[list(p) for p in labels], value] for labels, value in samples.items()]]
+            for name, (type_, help, samples) in families.items()}
+
+
+def _load(path):
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+    return {name: (type_, help, {tuple(tuple(p) for p in labels): value for labels, value in samples})
+            for name, (type_, help, samples) in data.items()}
+
+
+def _write_json(path, data):
+    # write then rename, readers never see a partial file
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+@contextmanager
+def _locked(directory, mode):
+    if mode is None:
+        yield
+        return
+    with open(os.path.join(directory, LOCK_FILE), "a") as f:
+        fcntl.flock(f, mode)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+REGISTRY = Registry(directory=METRICS_DIR)
+
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "adsb_request_seconds", "Request latency by route", ["route", "method", "status"]))
+RESPONSE_BYTES = REGISTRY.register(Histogram(
+    "adsb_response_bytes", "Response payload size by route", ["route"], buckets=SIZE_BUCKETS))
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "adsb_stage_seconds", "Time spent in each processing stage", ["stage", "operation"]))
+ROWS = REGISTRY.register(Counter(
+    "adsb_rows_total", "Documents/aircraft handled by each stage", ["stage", "operation"]))
+
+
+@contextmanager
+def timed(stage, operation=""):
+    """Observe the duration of the with-block in adsb_stage_seconds."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage, operation=operation)
+
+
+def count_rows(stage, n, operation=""):
+    ROWS.inc(n, stage=stage, operation=operation)
@@ -1,5 +1,67 @@
 import pymongo
+import os
+import threading
 from datetime import datetime, timedelta
+from metrics import timed, count_rows
+
+
+MONGO_HOST = os.environ.get("MONGO_HOST", "127.0.0.1")
+MONGO_PORT = int(os.environ.get("MONGO_PORT", 27017))
+MONGO_DB = os.environ.get("MONGO_DB", "adsb_db")
+MONGO_COLLECTION = os.environ.get("MONGO_COLLECTION", "api_data")
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Return this process's MongoClient, creating it on first use.
+
+    MongoClient is not fork-safe, so a client created before a worker fork is
+    discarded and a new one is opened in the child. The client is thread-safe and
+    pools its connections, so one per process is shared by all request threads.
+    """
+    global _client, _client_pid
+
+    if _client is None or _client_pid != os.getpid():
+        with _client_lock:
+            if _client is None or _client_pid != os.getpid():
+                _client = pymongo.MongoClient(MONGO_HOST, MONGO_PORT, connect=False)
+                _client_pid = os.getpid()
+    return _client
+
+
+def set_client(client):
+    """Use an existing client for this process, e.g. a local stand-in for load tests."""
+    global _client, _client_pid
+    with _client_lock:
+        _client = client
+        _client_pid = os.getpid()
+
+
+def reset_client():
+    """Forget the current client, e.g. in a post-fork hook."""
+    global _client, _client_pid
+    with _client_lock:
+        _client = None
+        _client_pid = None
+
+
+def get_collection():
+    """Return the ADS-B state collection for this process."""
+    return get_client()[MONGO_DB][MONGO_COLLECTION]
+
+
+class LazyCollection:
+    """
+    Module-level stand-in for a collection that resolves to get_collection() on
+    every attribute access, so it can be created at import without connecting.
+    """
+
+    def __getattr__(self, name):
+        return getattr(get_collection(), name)
 
 
 def get_distinct_days_from_adsb() -> list:
@@ -10,12 +72,7 @@ def get_distinct_days_from_adsb() -> list:
     Returns:
         Sorted list of unique days in 'YYYY-MM-DD' format.
     """
-    host = "127.0.0.1"
-    port = 27017
-    
-    client = pymongo.MongoClient(host, port)
-    db = client.adsb_db
-    collection = db.api_data
+    collection = get_collection()
 
     pipeline = [
         {
@@ -42,8 +99,9 @@ def get_distinct_days_from_adsb() -> list:
         }
     ]
 
-    results = collection.aggregate(pipeline)
-    return [doc["_id"] for doc in results]
+    with timed("db_query", "distinct_days"):
+        results = collection.aggregate(pipeline)
+        return [doc["_id"] for doc in results]
 
 
 def get_distinct_times_from_adsb(day):
@@ -58,9 +116,7 @@ def get_distinct_times_from_adsb(day):
         List of strings representing distinct times, sorted chronologically.
         Returns an empty list if no data is found.
     """
-    client = pymongo.MongoClient("127.0.0.1", 27017)
-    db = client.adsb_db
-    collection = db.api_data
+    collection = get_collection()
 
     pipeline = [
         {
@@ -89,12 +145,13 @@ def get_distinct_times_from_adsb(day):
         }
     ]
 
-    result = list(collection.aggregate(pipeline))
+    with timed("db_query", "distinct_times"):
+        result = list(collection.aggregate(pipeline))
     return [doc["_id"] for doc in result]
 
 
 
-def get_data_window_for_date(date_str, start_time_str, window_seconds=1):
+def get_data_window_for_date(date_str, start_time_str, window_seconds=1, projection=None):
     """
     Queries MongoDB for documents in a specific time window using ISO 8601 timestamp strings.
 
@@ -102,6 +159,7 @@ def get_data_window_for_date(date_str, start_time_str, window_seconds=1):
         date_str (str): Date in 'YYYY-MM-DD' format.
         start_time_str (str): Time in 'HH:MM:SS' format.
         window_seconds (int): Number of seconds in the window.
+        projection (dict): Optional MongoDB projection for the returned fields.
     
     Returns:
         List of documents within the specified time window.
@@ -116,19 +174,17 @@ def get_data_window_for_date(date_str, start_time_str, window_seconds=1):
 
     print("Mongo query (ISO timestamps):", start_iso, end_iso)
 
-    # Connect to MongoDB
-    host = "127.0.0.1"
-    port = 27017
-    client = pymongo.MongoClient(host, port)
-    db = client.adsb_db
-    collection = db.api_data
+    collection = get_collection()
 
     # Query documents within the time window
-    cursor = collection.find({
-        "properties.timestamp": {
-            "$gte": start_iso,
-            "$lte": end_iso
-        }
-    })
+    with timed("db_query", "window"):
+        cursor = collection.find({
+            "properties.timestamp": {
+                "$gte": start_iso,
+                "$lte": end_iso
+            }
+        }, projection)
+        docs = list(cursor)
 
-    return list(cursor)
+    count_rows("db_query", len(docs), "window")
+    return docs
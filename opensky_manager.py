@@ -1,38 +1,468 @@
-from opensky_api import OpenSkyApi
-import pandas as pd
-import geopandas as gpd
+from opensky_api import OpenSkyStates
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from metrics import timed, count_rows
+import requests
+import os
 import json
+import math
+import time
+import random
+import struct
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows, the budget is per process
+    fcntl = None
 
 
 # https://opensky-network.org/api/states/all?lamin=21&lomin=-136&lamax=50&lomax=-61
 # note, can call api in same way with this
 
 
-def get_os_states(bbox):
+# size of a single upstream request, larger regions are split into tiles
+MAX_TILE_LAT = 10.0
+MAX_TILE_LNG = 10.0
+# largest region served, in tiles (e.g. the continental US is 3 x 8 tiles)
+MAX_REGION_TILES = int(os.environ.get("OPENSKY_MAX_REGION_TILES", 32))
+# concurrent upstream requests per region
+FETCH_WORKERS = int(os.environ.get("OPENSKY_FETCH_WORKERS", 4))
+# upstream request budget shared by all requests in this process, or by every
+# worker process on the host when OPENSKY_RATE_PATH names a state file
+# (gunicorn.conf.py sets one)
+RATE_PER_SEC = float(os.environ.get("OPENSKY_RATE_PER_SEC", 4.0))
+RATE_BURST = int(os.environ.get("OPENSKY_RATE_BURST", 8))
+RATE_PATH = os.environ.get("OPENSKY_RATE_PATH")
+
+OPENSKY_URL = "https://opensky-network.org/api/states/all"
+# (connect, read) timeout per upstream request, seconds
+REQUEST_TIMEOUT = (3.05, float(os.environ.get("OPENSKY_READ_TIMEOUT", 5)))
+# total time one region fetch may take, including rate limiting and retries
+FETCH_DEADLINE = float(os.environ.get("OPENSKY_FETCH_DEADLINE", 8))
+RETRIES = 2
+BACKOFF = 0.5
+# consecutive failures that open the circuit, and how long it stays open
+BREAKER_THRESHOLD = 5
+BREAKER_RESET = 30.0
+# how long aircraft from the last good snapshot may be served as stale
+STALE_MAX_AGE = float(os.environ.get("OPENSKY_STALE_MAX_AGE", 300))
+
+
+class RateBudget:
+    """
+    Token bucket limiting upstream calls to rate per second with bursts of up to
+    burst calls. acquire() blocks until a token is free or timeout runs out.
+
+    With path set, the bucket lives in that file and is updated under an
+    exclusive flock, so all processes on the host share one budget. clock must
+    then be the same across processes (time.monotonic is system-wide on Linux).
+    """
+
+    STATE = struct.Struct("dd")  # tokens, updated
+
+    def __init__(self, rate=RATE_PER_SEC, burst=RATE_BURST, clock=time.monotonic, path=None):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.path = path if fcntl is not None else None
+        self._tokens = float(burst)
+        self._updated = clock()
+        self._lock = threading.Lock()
+        self._file = None
+        self._file_pid = None
+
+    def acquire(self, timeout=10.0):
+        deadline = self.clock() + timeout
+        while True:
+            with self._lock:
+                wait = self._take_shared() if self.path else self._take_local()
+            if wait == 0:
+                return True
+            if self.clock() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def _refill(self, tokens, updated):
+        """Return (tokens, now, seconds to wait); one token is taken if wait is 0."""
+        now = self.clock()
+        tokens = min(self.burst, tokens + max(now - updated, 0) * self.rate)
+        if tokens >= 1:
+            return tokens - 1, now, 0
+        return tokens, now, (1 - tokens) / self.rate
+
+    def _take_local(self):
+        self._tokens, self._updated, wait = self._refill(self._tokens, self._updated)
+        return wait
+
+    def _take_shared(self):
+        f = self._state_file()
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            f.seek(0)
+            data = f.read(self.STATE.size)
+            tokens, updated = self.STATE.unpack(data) if len(data) == self.STATE.size else (self.burst, self.clock())
+            tokens, updated, wait = self._refill(tokens, updated)
+            f.seek(0)
+            f.write(self.STATE.pack(tokens, updated))
+            f.flush()
+            return wait
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _state_file(self):
+        # one handle per process, flock state must not be inherited across a fork
+        if self._file is None or self._file_pid != os.getpid():
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            self._file = os.fdopen(fd, "r+b", buffering=0)
+            self._file_pid = os.getpid()
+        return self._file
+
+
+rate_budget = RateBudget(path=RATE_PATH)
+
+
+class UpstreamError(Exception):
+    """OpenSky did not answer with usable data."""
+
+
+class CircuitBreaker:
+    """
+    Fails fast after threshold consecutive failures. After reset_after seconds a
+    single trial call is let through; success closes the circuit again.
+    """
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, reset_after=BREAKER_RESET, clock=time.monotonic):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self.clock() - self.opened_at >= self.reset_after:
+                self.opened_at = self.clock()  # half-open: one trial per reset period
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.opened_at = self.clock()
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+
+class OpenSkyClient:
+    """
+    OpenSky /states/all client that reuses pooled HTTP connections, bounds every
+    request with a timeout, retries with jittered exponential backoff inside a
+    deadline and stops calling upstream while the circuit breaker is open.
+
+    get_states has the same signature and return type as OpenSkyApi.get_states,
+    but raises UpstreamError instead of returning None on failure.
+
+    Args:
+        username (str): Optional OpenSky account, anonymous if None.
+        password (str): Password for username.
+        session (requests.Session): Optional session, e.g. for tests.
+    """
+
+    def __init__(self, username=None, password=None, session=None, url=OPENSKY_URL,
+                 timeout=REQUEST_TIMEOUT, deadline=FETCH_DEADLINE, retries=RETRIES,
+                 backoff=BACKOFF, breaker=None):
+        self.url = url
+        self.timeout = timeout
+        self.deadline = deadline
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker()
+
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=FETCH_WORKERS * 2)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+        if username:
+            session.auth = (username, password)
+        self.session = session
+
+    def get_states(self, bbox=(), deadline=None):
+        """
+        deadline: optional time.monotonic() by which to give up, defaults to
+        self.deadline from now. Each attempt's timeout is clamped to it.
+        """
+        if not self.breaker.allow():
+            raise UpstreamError("OpenSky circuit open")
+
+        params = {}
+        if len(bbox) == 4:
+            params = {"lamin": bbox[0], "lamax": bbox[1], "lomin": bbox[2], "lomax": bbox[3]}
+
+        if deadline is None:
+            deadline = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise UpstreamError("OpenSky deadline exceeded")
+            timeout = (min(self.timeout[0], remaining), min(self.timeout[1], remaining))
+            try:
+                r = self.session.get(self.url, params=params, timeout=timeout)
+                if r.status_code == 200:
+                    self.breaker.success()
+                    return OpenSkyStates(r.json())
+                error = UpstreamError(f"OpenSky returned {r.status_code}")
+                retryable = r.status_code == 429 or r.status_code >= 500
+            except (requests.RequestException, ValueError) as e:
+                error = UpstreamError(f"OpenSky request failed: {e}")
+                retryable = True
+
+            # full jitter, never sleep past the deadline
+            delay = random.uniform(0, self.backoff * 2 ** attempt)
+            if not retryable or attempt >= self.retries or time.monotonic() + delay >= deadline:
+                self.breaker.failure()
+                raise error
+            time.sleep(delay)
+            attempt += 1
+
+
+class SnapshotStore:
+    """
+    Last known state of every aircraft seen by a successful fetch, used to answer
+    with stale data while upstream is slow or down.
+    """
+
+    def __init__(self, max_age=STALE_MAX_AGE):
+        self.max_age = max_age
+        self._states = {}  # icao24 -> (snapshot time, state dict)
+        self._lock = threading.Lock()
+
+    def update(self, dict_list, snapshot_time):
+        with self._lock:
+            for state in dict_list:
+                self._states[state["icao24"]] = (snapshot_time, state)
+            cutoff = time.time() - self.max_age
+            for icao24 in [k for k, (t, _) in self._states.items() if t < cutoff]:
+                del self._states[icao24]
+
+    def clip(self, bbox):
+        """Return (dict_list, snapshot times) of stored aircraft inside bbox."""
+        min_lat, max_lat, min_lng, max_lng = bbox
+        cutoff = time.time() - self.max_age
+        dict_list, times = [], []
+        with self._lock:
+            for t, state in self._states.values():
+                lat, lng = state.get("latitude"), state.get("longitude")
+                if t < cutoff or lat is None or lng is None:
+                    continue
+                if min_lat <= lat <= max_lat and min_lng <= lng <= max_lng:
+                    dict_list.append(state)
+                    times.append(t)
+        return dict_list, times
+
+
+# shared by all requests in this process
+opensky_client = OpenSkyClient(os.environ.get("OPENSKY_USERNAME"), os.environ.get("OPENSKY_PASSWORD"))
+snapshot_store = SnapshotStore()
+
+
+def tile_grid(bbox, max_lat=MAX_TILE_LAT, max_lng=MAX_TILE_LNG):
+    """Number of tiles (rows, columns) plan_tiles splits bbox into."""
+    n_lat = max(1, math.ceil(round((bbox[1] - bbox[0]) / max_lat, 9)))
+    n_lng = max(1, math.ceil(round((bbox[3] - bbox[2]) / max_lng, 9)))
+    return n_lat, n_lng
+
+
+def plan_tiles(bbox, max_lat=MAX_TILE_LAT, max_lng=MAX_TILE_LNG):
+    """
+    Split a bounding box into equal tiles no larger than max_lat x max_lng.
+
+    Parameters:
+    bbox: list [min_latitude, max_latitude, min_longitude, max_longitude]
+
+    Returns:
+    list of tile bboxes in the same format
+    """
+    min_lat, max_lat_, min_lng, max_lng_ = bbox
+    n_lat, n_lng = tile_grid(bbox, max_lat, max_lng)
+    lat_step = (max_lat_ - min_lat) / n_lat
+    lng_step = (max_lng_ - min_lng) / n_lng
+
+    tiles = []
+    for i in range(n_lat):
+        for j in range(n_lng):
+            tiles.append([
+                round(min_lat + i * lat_step, 4),
+                round(max_lat_ if i == n_lat - 1 else min_lat + (i + 1) * lat_step, 4),
+                round(min_lng + j * lng_step, 4),
+                round(max_lng_ if j == n_lng - 1 else min_lng + (j + 1) * lng_step, 4),
+            ])
+    return tiles
+
+
+def fetch_tile(api, tile, budget=None, deadline=None):
+    """
+    Fetch one tile, returns the OpenSkyStates response (or None if empty).
+    Waiting for the rate budget and the request itself end by deadline
+    (time.monotonic(), default FETCH_DEADLINE from now).
+    """
+    budget = budget or rate_budget
+    if deadline is None:
+        deadline = time.monotonic() + FETCH_DEADLINE
+    if not budget.acquire(timeout=max(deadline - time.monotonic(), 0)):
+        raise UpstreamError(f"Upstream rate budget exhausted for tile {tile}")
+    bbox = (tile[0], tile[1], tile[2], tile[3])
+    with timed("upstream_fetch", "opensky"):
+        if isinstance(api, OpenSkyClient):
+            return api.get_states(bbox=bbox, deadline=deadline)
+        return api.get_states(bbox=bbox)
+
+
+def merge_states(dict_lists):
+    """
+    Merge tile results, keeping one state per aircraft (icao24).
+    Aircraft on a shared tile edge appear twice, the latest contact wins.
+    """
+    by_icao = {}
+    for dict_list in dict_lists:
+        for state in dict_list:
+            current = by_icao.get(state["icao24"])
+            if current is None or (state["last_contact"] or 0) > (current["last_contact"] or 0):
+                by_icao[state["icao24"]] = state
+    return list(by_icao.values())
+
+
+def get_os_states(bbox, api=None, snapshots=None):
     """
     Fetch states within the given bounding box from the OpenSky API.
 
+    Boxes larger than one tile are split with plan_tiles and the tiles are
+    fetched concurrently, within the shared rate budget and one FETCH_DEADLINE
+    for the whole region. Tiles that fail are filled from the last good
+    snapshot: those aircraft keep the timestamp of the snapshot they come from
+    and the result is marked "stale": true with the "snapshot_time" of the
+    newest stale data. If a failed tile has no snapshot either, the result is
+    marked "partial": true.
+
     Parameters:
     bbox: list [min_latitude, max_latitude, min_longitude, max_longitude]
+    api: optional client (anything with get_states(bbox=...)), defaults to the
+         shared OpenSkyClient
+    snapshots: optional SnapshotStore, defaults to the shared one
 
     Returns:
     GeoJSON object containing flight state data.
     If no data is available, returns an empty GeoJSON FeatureCollection.
+    Returns None if upstream failed and there is no snapshot to fall back on.
     """
     try: 
-        api = OpenSkyApi()  # entire USA: 21, 50, -136, -61
-        s = api.get_states(bbox=(bbox[0], bbox[1], bbox[2], bbox[3]))
+        api = api or opensky_client  # entire USA: 21, 50, -136, -61
+        snapshots = snapshots or snapshot_store
+        tiles = plan_tiles(bbox)
+        deadline = time.monotonic() + FETCH_DEADLINE
+
+        fresh, failed = [], []
+        if len(tiles) == 1:
+            try:
+                fresh.append(fetch_tile(api, tiles[0], deadline=deadline))
+            except Exception as e:
+                print("An error occured fetching tile", tiles[0], e)
+                failed.append(tiles[0])
+        else:
+            with ThreadPoolExecutor(max_workers=min(FETCH_WORKERS, len(tiles))) as pool:
+                futures = [pool.submit(fetch_tile, api, tile, deadline=deadline) for tile in tiles]
+                for tile, future in zip(tiles, futures):
+                    try:
+                        fresh.append(future.result())
+                    except Exception as e:
+                        print("An error occured fetching tile", tile, e)
+                        failed.append(tile)
+
+        dict_lists = []
+        snapshot_time = None
+        for response in fresh:
+            if response is not None and response.states:
+                dict_lists.append([state.__dict__ for state in response.states])
+                snapshot_time = max(snapshot_time or 0, response.time)
+        if dict_lists:
+            snapshots.update(merge_states(dict_lists), snapshot_time)
+
+        stale_times = {}  # id(state) -> time of the snapshot it comes from
+        partial = False
+        for tile in failed:
+            stale, times = snapshots.clip(tile)
+            if not stale:
+                partial = True
+                continue
+            dict_lists.append(stale)
+            stale_times.update((id(state), t) for state, t in zip(stale, times))
+
+        if failed and not stale_times and not fresh:
+            return None  # nothing fresh and nothing to fall back on
+
+        dict_list = merge_states(dict_lists)
+        stale_time = max(stale_times.values()) if stale_times else None
 
         # If no positions are found, return an empty GeoJSON object
-        if s is None or not s.states:
-            return json.dumps({
-                "type": "FeatureCollection",
-                "features": []
-            })
+        if not dict_list:
+            geojson = {"type": "FeatureCollection", "features": []}
+        elif stale_time is None and not partial:
+            return state_vectors_to_geojson(dict_list, snapshot_time)
+        else:
+            times = [stale_times.get(id(state), snapshot_time) for state in dict_list]
+            geojson = json.loads(state_vectors_to_geojson(dict_list, times))
+
+        if stale_time is not None:
+            geojson["stale"] = True
+            geojson["snapshot_time"] = stale_time
+        if partial:
+            geojson["partial"] = True
+        return json.dumps(geojson)
+    
+    except Exception as e:
+        print("An error occured:", e)
+        return None
+
+
+# field order of an OpenSky state vector (see the /states/all REST response)
+STATE_FIELDS = ["icao24", "callsign", "origin_country", "time_position", "last_contact",
+                "longitude", "latitude", "baro_altitude", "on_ground", "velocity",
+                "true_track", "vertical_rate", "sensors", "geo_altitude", "squawk",
+                "spi", "position_source", "category"]
+
+
+def state_vectors_to_geojson(dict_list, time):
+    """
+    Convert OpenSky state vectors to the GeoJSON served by /api-call.
+
+    Parameters:
+    dict_list: list of dicts, one per state vector (keys from STATE_FIELDS)
+    time: unix time of the snapshot, or a list with one time per state
 
-        dict_list = [i.__dict__ for i in s.states]
+    Returns:
+    GeoJSON string (FeatureCollection)
+    """
+    # imported on first conversion so workers that only serve history start fast
+    import pandas as pd
+    import geopandas as gpd
+
+    count_rows("dataframe_conversion", len(dict_list), "opensky")
+    with timed("dataframe_conversion", "opensky"):
         df = pd.DataFrame(dict_list)
-        df["timestamp"] = s.time
+        df["timestamp"] = time
 
         # Convert to GeoDataFrame
         gdf = gpd.GeoDataFrame(
@@ -51,13 +481,6 @@ def get_os_states(bbox):
         # handle null values (set to 0)
         for col in gdf.columns:
             gdf[col] = gdf[col].fillna(0)
-        
-        return gdf.to_json()
-    
-    except Exception as e:
-        print("An error occured:", e)
-        return None
-
-
-
 
+    with timed("json_serialization", "opensky"):
+        return gdf.to_json()
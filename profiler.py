@@ -0,0 +1,119 @@
+import os
+import re
+import io
+import time
+import pstats
+import itertools
+from datetime import datetime, timezone
+
+
+# profile every request and keep the slow ones (PROFILE_REQUESTS=1), off by default
+PROFILE_ENABLED = os.environ.get("PROFILE_REQUESTS", "0") == "1"
+# requests faster than this are discarded (seconds)
+PROFILE_THRESHOLD = float(os.environ.get("PROFILE_THRESHOLD", 1.0))
+# when set, a request sent with "X-Profile: <token>" is always profiled and kept
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN")
+PROFILE_HEADER = "X-Profile"
+PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(os.getcwd(), "profiles"))
+# number of profiles kept on disk, oldest dropped first
+PROFILE_KEEP = int(os.environ.get("PROFILE_KEEP", 50))
+
+# <utc time>_<pid>_<seq>_<method>_<route>_<duration>ms.prof
+NAME_PATTERN = re.compile(r"^(\d{8}T\d{12})_(\d+)_(\d+)_([A-Z]+)_([A-Za-z0-9-]*)_(\d+)ms\.prof$")
+
+
+class ProfileStore:
+    """
+    Bounded ring buffer of cProfile dumps in a directory.
+
+    Each profile is one .prof file (pstats format, e.g. for snakeviz) whose name
+    records when it was taken, the request and its duration, so listing needs no
+    index. Files are named by UTC time first, so name order is age order, and the
+    oldest files beyond keep are deleted on every save. Several worker processes
+    can share the directory.
+
+    Args:
+        directory (str): Where profiles are written.
+        keep (int): Number of profiles kept.
+        clock (callable): Wall clock in seconds, for tests.
+    """
+
+    def __init__(self, directory=PROFILE_DIR, keep=PROFILE_KEEP, clock=time.time):
+        self.directory = directory
+        self.keep = keep
+        self.clock = clock
+        self._seq = itertools.count()
+
+    def save(self, profile, method, route, duration):
+        """
+        Write a finished profile and drop the oldest ones past the limit.
+
+        Args:
+            profile (cProfile.Profile): Disabled profiler.
+            method (str): HTTP method.
+            route (str): URL rule, e.g. '/get-historic-data-range/<date>/<start_time>'.
+            duration (float): Request duration in seconds.
+
+        Returns:
+            Filename of the stored profile.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.fromtimestamp(self.clock(), timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+        slug = re.sub(r"[^A-Za-z0-9-]+", "-", route).strip("-")
+        name = f"{stamp}_{os.getpid()}_{next(self._seq)}_{method}_{slug}_{int(duration * 1000)}ms.prof"
+
+        profile.dump_stats(os.path.join(self.directory, name))
+        self._trim()
+        return name
+
+    def list(self):
+        """Return metadata for the stored profiles, newest first."""
+        profiles = []
+        for name in self._names():
+            match = NAME_PATTERN.match(name)
+            try:
+                size = os.path.getsize(os.path.join(self.directory, name))
+            except FileNotFoundError:  # trimmed by another worker
+                continue
+            stamp, pid, _, method, route, duration_ms = match.groups()
+            created = datetime.strptime(stamp, "%Y%m%dT%H%M%S%f").replace(tzinfo=timezone.utc)
+            profiles.append({
+                "name": name,
+                "created": created.isoformat(),
+                "pid": int(pid),
+                "method": method,
+                "route": route,
+                "duration_ms": int(duration_ms),
+                "bytes": size,
+            })
+        return profiles[::-1]
+
+    def path(self, name):
+        """Full path of a stored profile, or None for unknown or malformed names."""
+        if not NAME_PATTERN.match(name):
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.exists(path) else None
+
+    def summary(self, name, limit=40):
+        """pstats text report sorted by cumulative time, or None if not found."""
+        path = self.path(name)
+        if path is None:
+            return None
+        out = io.StringIO()
+        pstats.Stats(path, stream=out).strip_dirs().sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
+
+    def _names(self):
+        try:
+            return sorted(n for n in os.listdir(self.directory) if NAME_PATTERN.match(n))
+        except FileNotFoundError:
+            return []
+
+    def _trim(self):
+        names = self._names()
+        for name in names[:max(len(names) - self.keep, 0)]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,125 @@
+import os
+import json
+import time
+import threading
+import numpy as np
+from opensky_manager import STATE_FIELDS, state_vectors_to_geojson
+
+
+FIXTURE_GEOJSON = "dataframe.geojson"
+REPLAY_FILE = os.environ.get("REPLAY_FILE", "opensky.json")
+# replay time multiplier, 2.0 plays snapshots twice as fast as recorded
+REPLAY_SPEED = float(os.environ.get("REPLAY_SPEED", 1.0))
+
+
+class FixtureSource:
+    """
+    Static GeoJSON fixture, parsed once and kept as compact serialized bytes.
+
+    Args:
+        path (str): GeoJSON file, e.g. dataframe.geojson.
+    """
+
+    def __init__(self, path=FIXTURE_GEOJSON):
+        self.path = path
+        self._body = None
+        self._lock = threading.Lock()
+
+    def body(self):
+        """Return the serialized FeatureCollection (bytes)."""
+        if self._body is None:
+            with self._lock:
+                if self._body is None:
+                    with open(self.path, "r") as f:
+                        data = json.load(f)
+                    self._body = json.dumps(data, separators=(",", ":")).encode()
+        return self._body
+
+
+class ReplaySource:
+    """
+    Fake live feed that replays recorded OpenSky /states/all responses.
+
+    The file holds one response ({"time": ..., "states": [...]}), a JSON list of
+    responses, or one response per line. Snapshots are converted to features once
+    on load; each request only filters the current snapshot by bbox. Playback
+    follows the recorded snapshot times scaled by speed and loops at the end.
+
+    Args:
+        path (str): Recorded responses, e.g. opensky.json.
+        speed (float): Playback speed multiplier.
+        clock (callable): Monotonic clock in seconds, for tests.
+    """
+
+    def __init__(self, path=REPLAY_FILE, speed=REPLAY_SPEED, clock=time.monotonic):
+        self.path = path
+        self.speed = speed
+        self.clock = clock
+        self.snapshots = []  # (time, features, lng array, lat array)
+        self._start = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Read and convert the recorded snapshots (once)."""
+        with self._lock:
+            if self.snapshots:
+                return
+
+            with open(self.path, "r") as f:
+                text = f.read()
+            try:
+                responses = json.loads(text)
+            except json.JSONDecodeError:
+                responses = [json.loads(line) for line in text.splitlines() if line.strip()]
+            if isinstance(responses, dict):
+                responses = [responses]
+
+            for response in sorted(responses, key=lambda r: r["time"]):
+                states = response.get("states") or []
+                if states:
+                    dict_list = [dict(zip(STATE_FIELDS, state)) for state in states]
+                    features = json.loads(state_vectors_to_geojson(dict_list, response["time"]))["features"]
+                else:
+                    features = []
+                coords = np.array([(f["properties"]["longitude"], f["properties"]["latitude"]) for f in features],
+                                  dtype=float).reshape(-1, 2)
+                self.snapshots.append((response["time"], features, coords[:, 0], coords[:, 1]))
+
+            if not self.snapshots:
+                raise ValueError(f"No snapshots in {self.path}")
+            self._start = self.clock()
+
+    def current(self):
+        """Return the snapshot that is 'live' at the current replay time."""
+        self.load()
+        first = self.snapshots[0][0]
+        duration = self.snapshots[-1][0] - first
+        if duration <= 0:
+            return self.snapshots[0]
+
+        # loop one recorded interval after the last snapshot
+        period = duration + (duration / max(len(self.snapshots) - 1, 1))
+        replay_time = first + ((self.clock() - self._start) * self.speed) % period
+        current = self.snapshots[0]
+        for snapshot in self.snapshots:
+            if snapshot[0] > replay_time:
+                break
+            current = snapshot
+        return current
+
+    def get_states(self, bbox):
+        """
+        Drop-in replacement for opensky_manager.get_os_states.
+
+        Parameters:
+        bbox: list [min_latitude, max_latitude, min_longitude, max_longitude]
+
+        Returns:
+        GeoJSON string with the replayed states inside bbox.
+        """
+        _, features, lng, lat = self.current()
+        inside = np.flatnonzero((lat >= bbox[0]) & (lat <= bbox[1]) & (lng >= bbox[2]) & (lng <= bbox[3]))
+        return json.dumps({
+            "type": "FeatureCollection",
+            "features": [features[i] for i in inside]
+        })
@@ -0,0 +1,242 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+
+# in-memory budget for serialized responses (bytes)
+DEFAULT_MAX_BYTES = int(os.environ.get("RESULT_CACHE_MAX_BYTES", 64 * 1024 ** 2))
+# budget for the optional on-disk store shared by workers (bytes)
+DEFAULT_MAX_DISK_BYTES = int(os.environ.get("RESULT_CACHE_MAX_DISK_BYTES", 512 * 1024 ** 2))
+# without a shared store other workers' inserts are invisible, so current-day
+# entries are only reused for this long (seconds)
+DEFAULT_TODAY_TTL = float(os.environ.get("RESULT_CACHE_TODAY_TTL", 10))
+
+
+def utc_today():
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+
+class ResultCache:
+    """
+    LRU cache of serialized query responses.
+
+    Keys are tuples whose first element is the date ('YYYY-MM-DD') the query
+    covers, e.g. (date, start_time, window_seconds, projection). Stored history
+    is append-only, so only entries for the current day can go stale; those are
+    dropped by invalidate_date when new documents are inserted.
+
+    With store_path set, entries are also written to a sqlite file so that other
+    worker processes on the same host can reuse them. Invalidations bump a
+    per-date generation in the store, which every worker checks before serving
+    a current-day entry from memory. Without a store, a worker cannot see other
+    workers' invalidations, so current-day entries expire after today_ttl.
+
+    A miss records the generation it saw (per thread); put() for that key drops
+    the body if the date was invalidated in between, i.e. documents were
+    inserted while the query ran.
+
+    Args:
+        max_bytes (int): Memory budget for cached bodies.
+        store_path (str): Optional sqlite file shared across workers.
+        max_disk_bytes (int): Budget for the sqlite store.
+        today_ttl (float): Lifetime of current-day entries without a store.
+        clock (callable): Monotonic clock in seconds, for tests.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, store_path=None, max_disk_bytes=DEFAULT_MAX_DISK_BYTES,
+                 today_ttl=DEFAULT_TODAY_TTL, clock=time.monotonic):
+        self.max_bytes = max_bytes
+        self.store_path = store_path
+        self.max_disk_bytes = max_disk_bytes
+        self.today_ttl = today_ttl
+        self.clock = clock
+
+        self._entries = OrderedDict()  # key -> (body, generation, stored_at, variants), LRU first
+        self._last_miss = threading.local()  # (key, generation) of this thread's last miss
+        self._bytes = 0
+        self._generations = {}  # date -> generation, used without a store
+        self._lock = threading.RLock()
+
+        self._conn = None
+        self._conn_pid = None
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        """Return the cached body for key, or None."""
+        date = key[0]
+        current = date == utc_today()
+
+        with self._lock:
+            generation = self._generation(date) if current else 0
+
+            cached = self._entries.get(key)
+            if cached is not None:
+                body, cached_generation, stored_at, _ = cached
+                expired = current and not self.store_path and self.clock() - stored_at > self.today_ttl
+                if cached_generation == generation and not expired:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return body
+                self._pop(key)  # new inserts for today, here or in another worker
+
+            if self.store_path:
+                body = self._disk_get(key, generation)
+                if body is not None:
+                    self._insert(key, body, generation)
+                    self.disk_hits += 1
+                    return body
+
+            self._last_miss.entry = (key, generation)
+            self.misses += 1
+            return None
+
+    def put(self, key, body):
+        """
+        Store a serialized body (bytes) for key, unless its date was invalidated
+        since this thread's get() missed it.
+        """
+        date = key[0]
+        with self._lock:
+            generation = self._generation(date) if date == utc_today() else 0
+            last_miss = getattr(self._last_miss, "entry", None)
+            self._last_miss.entry = None
+            if last_miss is not None and last_miss[0] == key and last_miss[1] != generation:
+                return  # the body may predate the inserts
+            self._insert(key, body, generation)
+            if self.store_path:
+                self._disk_put(key, date, body, generation)
+
+    def variant(self, key, body, name, make):
+        """
+        Return a value derived from a cached body, e.g. its gzip encoding or
+        ETag, computing it with make() only the first time. Variants are kept
+        with the entry (and count towards max_bytes) while its body is body.
+
+        Args:
+            key (tuple): Cache key the body was stored or found under.
+            body (bytes): The body returned by get() or passed to put().
+            name (str): Variant name, e.g. 'gzip'.
+            make (callable): make() returns the variant (bytes or str).
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is body and name in entry[3]:
+                return entry[3][name]
+
+        value = make()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            # the body may have been replaced or evicted meanwhile
+            if entry is not None and entry[0] is body and name not in entry[3]:
+                entry[3][name] = value
+                self._bytes += len(value)
+                while self._bytes > self.max_bytes and len(self._entries) > 1:
+                    oldest = next(iter(self._entries))
+                    self._pop(oldest if oldest != key else list(self._entries)[1])
+        return value
+
+    def invalidate_date(self, date):
+        """Drop every entry for date, call after inserting documents for that day."""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == date]:
+                self._pop(key)
+            self._generations[date] = self._generations.get(date, 0) + 1
+            if self.store_path:
+                conn = self._connection()
+                with conn:
+                    conn.execute("DELETE FROM results WHERE date = ?", (date,))
+                    conn.execute(
+                        "INSERT INTO generations (date, generation) VALUES (?, 1) "
+                        "ON CONFLICT(date) DO UPDATE SET generation = generation + 1",
+                        (date,))
+            self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            if self.store_path:
+                conn = self._connection()
+                with conn:
+                    conn.execute("DELETE FROM results")
+
+    def stats(self):
+        """Return hit/miss counters and memory usage."""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+            }
+
+    def _insert(self, key, body, generation):
+        if len(body) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._pop(key)
+        self._entries[key] = (body, generation, self.clock(), {})
+        self._bytes += len(body)
+        while self._bytes > self.max_bytes:
+            self._pop(next(iter(self._entries)))
+
+    def _pop(self, key):
+        body, _, _, variants = self._entries.pop(key)
+        self._bytes -= len(body) + sum(len(v) for v in variants.values())
+
+    def _generation(self, date):
+        if not self.store_path:
+            return self._generations.get(date, 0)
+        row = self._connection().execute(
+            "SELECT generation FROM generations WHERE date = ?", (date,)).fetchone()
+        return row[0] if row else 0
+
+    def _connection(self):
+        # sqlite connections must not cross a fork, open one per process
+        if self._conn is None or self._conn_pid != os.getpid():
+            conn = sqlite3.connect(self.store_path, timeout=5, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, date TEXT, generation INTEGER, body BLOB)")
+            conn.execute("CREATE INDEX IF NOT EXISTS results_date ON results (date)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS generations (date TEXT PRIMARY KEY, generation INTEGER)")
+            conn.commit()
+            self._conn = conn
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    def _disk_get(self, key, generation):
+        row = self._connection().execute(
+            "SELECT body FROM results WHERE key = ? AND generation = ?",
+            (json.dumps(key), generation)).fetchone()
+        return bytes(row[0]) if row else None
+
+    def _disk_put(self, key, date, body, generation):
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO results (key, date, generation, body) VALUES (?, ?, ?, ?)",
+                (json.dumps(key), date, generation, sqlite3.Binary(body)))
+            total = conn.execute("SELECT COALESCE(SUM(LENGTH(body)), 0) FROM results").fetchone()[0]
+            if total > self.max_disk_bytes:
+                # drop the oldest quarter of the store
+                conn.execute(
+                    "DELETE FROM results WHERE rowid IN "
+                    "(SELECT rowid FROM results ORDER BY rowid LIMIT "
+                    "(SELECT COUNT(*) / 4 + 1 FROM results))")
@@ -1,12 +1,13 @@
 import pytest
 from unittest.mock import patch, MagicMock
 from flask import Flask
-from flask_app import app  # Import the Flask app
+from flask_app import app, live_cache  # Import the Flask app
 import json
 
 @pytest.fixture
 def client():
     """Fixture to set up the test client."""
+    live_cache.clear()  # each test mocks its own upstream response
     with app.test_client() as client:
         yield client
 
@@ -190,3 +191,138 @@ def test_api_call_valid_data_within_bbox(client, bbox):
             assert min_lng <= lon <= max_lng, f"Longitude {lon} out of bounds"
 
     print(f"test_api_call_valid_data_within_bbox passed for bbox: {bbox}")
+
+# UT-9
+@patch("flask_app.get_data_window_for_date", return_value=[
+    {"_id": i, "type": "Feature", "properties": {"icao24": f"a{i:05d}", "timestamp": "2025-04-18T22:13:14Z"}}
+    for i in range(50)
+])
+def test_historic_data_etag_and_304(mock_window, client):
+    """Test that historic data for a past day is cacheable and revalidates with 304."""
+
+    response = client.get("/get-historic-data-range/2025-04-18/22:13:14")
+
+    assert response.status_code == 200
+    assert response.headers["ETag"].startswith("W/")
+    assert response.cache_control.max_age > 0
+    assert response.last_modified is not None
+
+    etag = response.headers["ETag"]
+    response = client.get("/get-historic-data-range/2025-04-18/22:13:14",
+                          headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.data == b""
+
+# UT-10
+@patch("flask_app.get_data_window_for_date", return_value=[
+    {"_id": i, "type": "Feature", "properties": {"icao24": f"a{i:05d}", "timestamp": "2025-04-18T22:13:14Z"}}
+    for i in range(50)
+])
+def test_historic_data_gzip(mock_window, client):
+    """Test that large JSON payloads are gzip compressed when the client accepts it."""
+    import gzip
+
+    response = client.get("/get-historic-data-range/2025-04-18/22:13:14",
+                          headers={"Accept-Encoding": "gzip"})
+
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    data = json.loads(gzip.decompress(response.data))
+    assert len(data) == 50
+
+# UT-11
+def test_composite_served_immutable(client, tmp_path):
+    """Test that timestamp-named composites are served with long-lived cache headers."""
+    (tmp_path / "20250418_221117_merc.png").write_bytes(b"fake image data")
+
+    with patch("flask_app.IMAGE_FOLDER", str(tmp_path)):
+        response = client.get("/get-latest-image/20250418_221117_merc.png")
+
+    assert response.status_code == 200
+    assert response.cache_control.immutable
+    assert response.cache_control.max_age >= 24 * 3600
+
+# UT-12
+@patch("flask_app.get_os_states", return_value=None)  # upstream down, no snapshot
+def test_api_call_upstream_failure_status(mock_get_os_states, client):
+    """Test that an upstream failure without fallback data is not reported as success."""
+
+    response = client.get("/api-call/34.0,35.0,-118.0,-117.0/0")
+
+    assert response.status_code == 503
+    assert json.loads(response.data)["error"] == "Failed to retrieve data"
+
+# UT-13
+def test_metrics_endpoint(client):
+    """Test that requests are timed per route and exposed in Prometheus text format."""
+    client.get("/get-latest-image/missing.png")
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    body = response.data.decode()
+    assert "# TYPE adsb_request_seconds histogram" in body
+    assert 'route="/get-latest-image/<path:filename>"' in body
+    assert 'adsb_cache_hits_total{cache="live"}' in body
+
+# UT-14
+def test_slow_request_profiled(tmp_path):
+    """Test that profiling keeps requests over the threshold and lists them."""
+    from flask_app import create_app
+    from profiler import ProfileStore
+
+    profiled_app = create_app({"PROFILING": True, "PROFILE_THRESHOLD": 0.0})
+    with patch("flask_app.profile_store", ProfileStore(str(tmp_path))), profiled_app.test_client() as client:
+        response = client.get("/")
+        profile_id = response.headers["X-Profile-Id"]
+
+        listed = json.loads(client.get("/profiles").data)
+        assert [p["name"] for p in listed] == [profile_id]
+        assert client.get(f"/profiles/{profile_id}?format=text").status_code == 200
+
+# UT-15
+def test_profiling_off_by_default(client):
+    """Test that requests are not profiled and profiles are hidden unless enabled."""
+    response = client.get("/")
+
+    assert "X-Profile-Id" not in response.headers
+    assert client.get("/profiles").status_code == 404
+
+# UT-16
+@patch("flask_app.collection.insert_many")
+@patch("flask_app.get_os_states", return_value=json.dumps({
+    "type": "FeatureCollection",
+    "features": [{"type": "Feature", "geometry": {"type": "Point", "coordinates": [-118.0, 34.0]}, "properties": {}}],
+    "partial": True
+}))  # a tile failed and had no snapshot
+def test_api_call_partial_not_saved(mock_get_os_states, mock_insert_many, client):
+    """Test that an incomplete region is served but not stored as a snapshot."""
+
+    response = client.get("/api-call/34.0,35.0,-118.0,-117.0/1")
+
+    assert response.status_code == 200
+    assert json.loads(response.data)["partial"] is True
+    mock_insert_many.assert_not_called()
+
+# UT-17
+@patch("flask_app.get_data_window_for_date", return_value=[
+    {"_id": i, "type": "Feature", "properties": {"icao24": f"b{i:05d}", "timestamp": "2025-04-18T22:20:00Z"}}
+    for i in range(50)
+])
+def test_historic_cache_hit_not_recompressed(mock_window, client):
+    """Test that a cached window is compressed and hashed once, then reused."""
+    import gzip
+
+    with patch("flask_app.gzip.compress", wraps=gzip.compress) as spy_compress, \
+            patch("flask_app.generate_etag", wraps=__import__("werkzeug.http").http.generate_etag) as spy_etag:
+        first = client.get("/get-historic-data-range/2025-04-18/22:20:00", headers={"Accept-Encoding": "gzip"})
+        second = client.get("/get-historic-data-range/2025-04-18/22:20:00", headers={"Accept-Encoding": "gzip"})
+
+    assert first.headers["Content-Encoding"] == second.headers["Content-Encoding"] == "gzip"
+    assert first.data == second.data
+    assert first.headers["ETag"] == second.headers["ETag"]
+    assert spy_compress.call_count == 1
+    assert spy_etag.call_count == 1
+    assert len(json.loads(gzip.decompress(second.data))) == 50
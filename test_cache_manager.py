@@ -0,0 +1,136 @@
+import os
+import threading
+from datetime import datetime, timedelta
+from cache_manager import CompositeCache
+
+# to run: pytest test_cache_manager.py
+
+
+def write_png(directory, time_string, size):
+    path = os.path.join(directory, time_string + "_merc.png")
+    with open(path, "wb") as f:
+        f.write(b"\0" * size)
+    return path
+
+
+def test_load_indexes_existing_composites(tmp_path):
+    """Test that PNGs already on disk are found without re-rendering."""
+    write_png(tmp_path, "20250418_221117", 10)
+    (tmp_path / "notes.txt").write_text("not a composite")
+
+    cache = CompositeCache(str(tmp_path))
+
+    assert cache.get("20250418_221117") == "20250418_221117_merc.png"
+    assert cache.get("20250418_221617") is None
+    assert cache.stats()["entries"] == 1
+
+
+def test_nearest_scan_lookup(tmp_path):
+    """Test that historic lookups match the closest scan within the tolerance."""
+    cache = CompositeCache(str(tmp_path))
+    cache.add("20250418_221117", write_png(tmp_path, "20250418_221117", 10))
+    cache.add("20250418_222117", write_png(tmp_path, "20250418_222117", 10))
+
+    assert cache.nearest(datetime(2025, 4, 18, 22, 12, 15)) == "20250418_221117_merc.png"
+    assert cache.nearest(datetime(2025, 4, 18, 22, 20, 0)) == "20250418_222117_merc.png"
+    # the 22:16 scan was never rendered
+    assert cache.nearest(datetime(2025, 4, 18, 22, 16, 17)) is None
+
+
+def test_lru_eviction_to_budget(tmp_path):
+    """Test that the least recently used composites are deleted once over budget."""
+    cache = CompositeCache(str(tmp_path), max_bytes=25)
+    first = cache.add("20250418_220117", write_png(tmp_path, "20250418_220117", 10))
+    cache.add("20250418_220617", write_png(tmp_path, "20250418_220617", 10))
+
+    cache.get("20250418_220117")  # most recently used now
+    cache.add("20250418_221117", write_png(tmp_path, "20250418_221117", 10))
+
+    assert cache.get("20250418_220617") is None
+    assert not os.path.exists(tmp_path / "20250418_220617_merc.png")
+    assert os.path.exists(tmp_path / first)
+    assert cache.stats()["bytes"] == 20
+    assert cache.stats()["evictions"] == 1
+
+
+def test_age_eviction(tmp_path):
+    """Test that composites idle for longer than max_age are evicted."""
+    path = write_png(tmp_path, "20250418_220117", 10)
+    old = (datetime.now() - timedelta(days=2)).timestamp()
+    os.utime(path, (old, old))
+
+    cache = CompositeCache(str(tmp_path), max_age=timedelta(days=1))
+
+    assert cache.get("20250418_220117") is None
+    assert not os.path.exists(path)
+
+
+def test_render_lock_shared_per_scan(tmp_path):
+    """Test that concurrent requests for the same scan render it once."""
+    cache = CompositeCache(str(tmp_path))
+    renders = []
+
+    def request():
+        with cache.render_lock("20250418_221117"):
+            if cache.get("20250418_221117") is None:
+                renders.append(1)
+                cache.add("20250418_221117", write_png(tmp_path, "20250418_221117", 10))
+
+    threads = [threading.Thread(target=request) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(renders) == 1
+    assert cache.render_lock("20250418_221117") is cache.render_lock("20250418_221117")
+
+
+def test_workers_see_each_others_renders_and_evictions(tmp_path):
+    """Test that two caches on one directory (two workers) agree with the disk."""
+    worker_a = CompositeCache(str(tmp_path))
+    worker_b = CompositeCache(str(tmp_path))
+    worker_b.load()
+
+    worker_a.add("20250418_221117", write_png(tmp_path, "20250418_221117", 10))
+    assert worker_b.get("20250418_221117") == "20250418_221117_merc.png"
+    assert worker_b.nearest(datetime(2025, 4, 18, 22, 12, 0)) == "20250418_221117_merc.png"
+
+    os.remove(tmp_path / "20250418_221117_merc.png")  # evicted by a third worker
+    assert worker_b.get("20250418_221117") is None
+    assert worker_a.nearest(datetime(2025, 4, 18, 22, 12, 0)) is None
+
+
+def test_budget_covers_all_workers(tmp_path):
+    """Test that eviction counts composites written by other workers."""
+    worker_a = CompositeCache(str(tmp_path), max_bytes=25)
+    worker_b = CompositeCache(str(tmp_path), max_bytes=25)
+    worker_a.load()
+    worker_b.load()
+
+    worker_a.add("20250418_220117", write_png(tmp_path, "20250418_220117", 10))
+    worker_b.add("20250418_220617", write_png(tmp_path, "20250418_220617", 10))
+    worker_a.add("20250418_221117", write_png(tmp_path, "20250418_221117", 10))
+
+    pngs = [n for n in os.listdir(tmp_path) if n.endswith("_merc.png")]
+    assert len(pngs) == 2
+
+
+def test_render_lock_shared_between_workers(tmp_path):
+    """Test that the render lock also excludes another cache on the same directory."""
+    workers = [CompositeCache(str(tmp_path)) for _ in range(4)]
+    renders = []
+
+    def request(cache):
+        with cache.render_lock("20250418_221117"):
+            if cache.get("20250418_221117") is None:
+                renders.append(1)
+                cache.add("20250418_221117", write_png(tmp_path, "20250418_221117", 10))
+
+    threads = [threading.Thread(target=request, args=(workers[i % 4],)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(renders) == 1
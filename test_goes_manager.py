@@ -0,0 +1,37 @@
+import numpy as np
+from PIL import Image
+from rasterio.io import MemoryFile
+from rasterio.enums import ColorInterp
+from rasterio.transform import from_origin
+from goes_manager import encode_geotiff
+
+# to run: pytest test_goes_manager.py
+
+
+def test_encode_geotiff_keeps_enhanced_colours(tmp_path):
+    """Test that a satpy-style uint8 RGBA GeoTIFF keeps its colours and alpha mask."""
+    height, width = 20, 16
+    rgb = np.zeros((3, height, width), dtype=np.uint8)
+    rgb[0] = np.arange(width, dtype=np.uint8) * 16
+    rgb[1] = 99
+    rgb[2] = 200
+    alpha = np.full((height, width), 255, dtype=np.uint8)
+    alpha[:, :4] = 0  # outside the disk after reprojection
+    rgb[:, :, :4] = 0
+
+    profile = {"driver": "GTiff", "height": height, "width": width, "count": 4, "dtype": "uint8",
+               "crs": "EPSG:3857", "transform": from_origin(0, 0, 1000, 1000)}
+    png_path = str(tmp_path / "out.png")
+    with MemoryFile() as memfile:
+        with memfile.open(**profile) as dst:
+            dst.write(rgb, [1, 2, 3])
+            dst.write(alpha, 4)
+            dst.colorinterp = [ColorInterp.red, ColorInterp.green, ColorInterp.blue, ColorInterp.alpha]
+        with memfile.open() as src:
+            encode_geotiff(src, png_path, chunk_rows=7)
+
+    rgba = np.array(Image.open(png_path))
+    assert rgba.shape == (height, width, 4)
+    np.testing.assert_array_equal(rgba[:, 4:, :3], np.moveaxis(rgb, 0, -1)[:, 4:])
+    assert (rgba[:, 4:, 3] == 255).all()
+    assert (rgba[:, :4] == 0).all()
@@ -0,0 +1,75 @@
+import numpy as np
+from PIL import Image
+from image_encoder import band_limits, valid_mask, encode_array
+
+# to run: pytest test_image_encoder.py
+
+
+def test_band_limits_ignore_nodata():
+    """Test that NoData pixels do not drag the percentile stretch."""
+    band = np.concatenate([np.full(1000, -999.0), np.linspace(10, 20, 1000)])
+    lo, hi = band_limits(band, valid_mask(band, nodata=-999))
+
+    assert 10 <= lo < hi <= 20
+
+
+def test_band_limits_flat_band():
+    """Test that a constant band still yields a usable range."""
+    band = np.full((4, 4), 7, dtype=np.uint8)
+    lo, hi = band_limits(band, valid_mask(band))
+
+    assert hi > lo
+
+
+def test_encode_array_rgba_with_alpha(tmp_path):
+    """Test that NaN pixels become transparent and the rest is stretched per band."""
+    array = np.zeros((3, 40, 30), dtype=np.float32)
+    array[0] = np.linspace(0, 1, 30)
+    array[1] = np.linspace(100, 200, 30)
+    array[2] = 5
+    array[:, :, :10] = np.nan
+    before = array.copy()
+
+    png_path = str(tmp_path / "out.png")
+    encode_array(array, png_path, chunk_rows=7)
+
+    img = Image.open(png_path)
+    rgba = np.array(img)
+    assert img.mode == "RGBA"
+    assert rgba.shape == (40, 30, 4)
+    assert (rgba[:, :10] == 0).all()
+    assert (rgba[:, 10:, 3] == 255).all()
+    # both bands span their own range despite very different scales
+    assert rgba[0, 10:, 0].max() == 255 and rgba[0, 10:, 1].max() == 255
+    # chunking does not change rows
+    assert (rgba[0] == rgba[39]).all()
+    np.testing.assert_array_equal(array, before)
+
+
+def test_encode_array_uint8_nodata(tmp_path):
+    """Test that a single uint8 band encodes as LA with nodata masked."""
+    array = np.arange(100, dtype=np.uint8).reshape(1, 10, 10)
+
+    png_path = str(tmp_path / "out.png")
+    encode_array(array, png_path, nodata=0)
+
+    la = np.array(Image.open(png_path))
+    assert la.shape == (10, 10, 2)
+    assert la[0, 0, 1] == 0
+    assert (la.reshape(-1, 2)[1:, 1] == 255).all()
+
+
+def test_encode_array_uint8_colours_unchanged(tmp_path):
+    """Test that already enhanced uint8 RGB keeps its colours instead of being re-stretched."""
+    array = np.zeros((3, 10, 10), dtype=np.uint8)
+    array[0], array[1], array[2] = 40, 99, 200
+    array[:, 0, 0] = (99, 99, 99)
+    array[:, 9, 9] = (255, 0, 10)
+
+    png_path = str(tmp_path / "out.png")
+    encode_array(array, png_path)
+
+    rgba = np.array(Image.open(png_path))
+    assert tuple(rgba[0, 0]) == (99, 99, 99, 255)
+    assert tuple(rgba[9, 9]) == (255, 0, 10, 255)
+    assert tuple(rgba[5, 5]) == (40, 99, 200, 255)
@@ -0,0 +1,107 @@
+import json
+import time
+import threading
+from live_cache import CoalescingCache
+
+# to run: pytest test_live_cache.py
+
+
+def feature(icao24, lng, lat):
+    return {"type": "Feature", "geometry": {"type": "Point", "coordinates": [lng, lat]},
+            "properties": {"icao24": icao24, "longitude": lng, "latitude": lat}}
+
+
+class CountingFetch:
+    def __init__(self, features, release=None):
+        self.features = features
+        self.release = release
+        self.calls = 0
+
+    def __call__(self, bbox):
+        self.calls += 1
+        if self.release is not None:
+            self.release.wait()
+        return json.dumps({"type": "FeatureCollection", "features": self.features})
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_same_bbox_within_ttl_fetches_once():
+    """Test that repeated identical requests are served from the cache until the TTL."""
+    clock = FakeClock()
+    fetch = CountingFetch([feature("aaaaaa", -117.5, 34.5)])
+    cache = CoalescingCache(fetch, ttl=5, clock=clock)
+
+    first = cache.get([34.0, 35.0, -118.0, -117.0])
+    assert cache.get([34.0, 35.0, -118.0, -117.0]) == first
+    assert fetch.calls == 1
+
+    clock.now = 6
+    cache.get([34.0, 35.0, -118.0, -117.0])
+    assert fetch.calls == 2
+
+
+def test_contained_bbox_filtered_from_larger_entry():
+    """Test that a bbox inside a cached one is answered by filtering."""
+    fetch = CountingFetch([feature("aaaaaa", -117.5, 34.5), feature("bbbbbb", -112.0, 38.0)])
+    cache = CoalescingCache(fetch)
+
+    cache.get([30.0, 40.0, -120.0, -110.0])
+    data = json.loads(cache.get([34.0, 35.0, -118.0, -117.0]))
+
+    assert fetch.calls == 1
+    assert [f["properties"]["icao24"] for f in data["features"]] == ["aaaaaa"]
+    assert cache.stats()["contained_hits"] == 1
+
+
+def test_concurrent_requests_share_one_fetch():
+    """Test that identical requests arriving during a fetch wait for it."""
+    release = threading.Event()
+    fetch = CountingFetch([feature("aaaaaa", -117.5, 34.5)], release=release)
+    cache = CoalescingCache(fetch)
+    results = []
+
+    threads = [threading.Thread(target=lambda: results.append(cache.get([34.0, 35.0, -118.0, -117.0])))
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    deadline = time.monotonic() + 5
+    while cache.stats()["coalesced"] < 7 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    coalesced = cache.stats()["coalesced"]
+    release.set()
+    for t in threads:
+        t.join(timeout=5)
+
+    assert coalesced == 7, "requests did not wait on the in-flight fetch"
+
+    assert fetch.calls == 1
+    assert len(set(results)) == 1 and len(results) == 8
+
+
+def test_snapshot_claimed_once():
+    """Test that a shared snapshot is handed out for saving only once."""
+    fetch = CountingFetch([feature("aaaaaa", -117.5, 34.5)])
+    cache = CoalescingCache(fetch)
+
+    cache.get([30.0, 40.0, -120.0, -110.0])
+    cache.get([34.0, 35.0, -118.0, -117.0])
+
+    assert cache.claim([34.0, 35.0, -118.0, -117.0]) is not None
+    assert cache.claim([30.0, 40.0, -120.0, -110.0]) is None
+
+
+def test_failed_fetch_not_cached():
+    """Test that a failed upstream fetch is retried on the next request."""
+    calls = []
+    cache = CoalescingCache(lambda bbox: calls.append(bbox))
+
+    assert cache.get([34.0, 35.0, -118.0, -117.0]) is None
+    assert cache.get([34.0, 35.0, -118.0, -117.0]) is None
+    assert len(calls) == 2
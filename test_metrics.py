@@ -0,0 +1,100 @@
+import pytest
+from metrics import Counter, Histogram, Registry, STAGE_SECONDS, timed, mark_process_dead
+
+# to run: pytest test_metrics.py
+
+
+def test_counter_render():
+    """Test that counters are rendered per label set with HELP and TYPE lines."""
+    registry = Registry()
+    rows = registry.register(Counter("rows_total", "Rows", ["stage"]))
+    rows.inc(3, stage="db_insert")
+    rows.inc(2, stage="db_insert")
+
+    text = registry.render()
+
+    assert "# TYPE rows_total counter" in text
+    assert 'rows_total{stage="db_insert"} 5' in text
+
+
+def test_histogram_buckets_are_cumulative():
+    """Test that histogram buckets, sum and count follow the Prometheus format."""
+    registry = Registry()
+    latency = registry.register(Histogram("latency_seconds", "Latency", ["route"], buckets=(0.1, 1.0)))
+    latency.observe(0.05, route="/a")
+    latency.observe(0.5, route="/a")
+    latency.observe(5.0, route="/a")
+
+    text = registry.render()
+
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{route="/a",le="1.0"} 2' in text
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 3' in text
+    assert 'latency_seconds_sum{route="/a"} 5.55' in text
+    assert 'latency_seconds_count{route="/a"} 3' in text
+
+
+def test_collector_values_read_at_render():
+    """Test that collectors are called on every scrape."""
+    registry = Registry()
+    hits = {"n": 0}
+    registry.add_collector(lambda: [("hits_total", "counter", "Hits", {(("cache", "live"),): hits["n"]})])
+
+    hits["n"] = 7
+
+    assert 'hits_total{cache="live"} 7' in registry.render()
+
+
+def test_timed_records_on_error():
+    """Test that a stage is still timed when the block raises."""
+    before = STAGE_SECONDS.count(stage="test_stage", operation="error")
+
+    with pytest.raises(RuntimeError):
+        with timed("test_stage", "error"):
+            raise RuntimeError("boom")
+
+    assert STAGE_SECONDS.count(stage="test_stage", operation="error") == before + 1
+
+
+def make_worker(directory, pid):
+    """A registry as one gunicorn worker would have it."""
+    registry = Registry(directory=directory, pid=pid)
+    requests = registry.register(Counter("requests_total", "Requests", ["route"]))
+    latency = registry.register(Histogram("latency_seconds", "Latency", ["route"], buckets=(0.1, 1.0)))
+    sessions = {"n": 0}
+    registry.add_collector(lambda: [("sessions", "gauge", "Open sessions", {(): sessions["n"]})])
+    return registry, requests, latency, sessions
+
+
+def test_workers_merged_and_survive_recycling(tmp_path):
+    """Test that /metrics from any worker sums all workers, including exited ones."""
+    directory = str(tmp_path)
+    worker_a, requests_a, latency_a, sessions_a = make_worker(directory, 1001)
+    worker_b, requests_b, latency_b, sessions_b = make_worker(directory, 1002)
+
+    requests_a.inc(3, route="/a")
+    latency_a.observe(0.05, route="/a")
+    sessions_a["n"] = 2
+    requests_b.inc(4, route="/a")
+    latency_b.observe(0.5, route="/a")
+    sessions_b["n"] = 5
+    worker_b.flush()
+
+    text = worker_a.render()
+    assert 'requests_total{route="/a"} 7' in text
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{route="/a",le="1.0"} 2' in text
+    assert 'latency_seconds_count{route="/a"} 2' in text
+    assert "sessions 7" in text
+
+    # worker B is recycled: its counts stay, its gauges go
+    mark_process_dead(1002, directory)
+    text = worker_a.render()
+    assert 'requests_total{route="/a"} 7' in text
+    assert "sessions 2" in text
+
+    # its replacement starts from zero and adds to the total
+    worker_c, requests_c, _, _ = make_worker(directory, 1003)
+    requests_c.inc(1, route="/a")
+    worker_c.flush()
+    assert 'requests_total{route="/a"} 8' in worker_a.render()
@@ -0,0 +1,229 @@
+import json
+import threading
+from types import SimpleNamespace
+import pytest
+import requests
+from opensky_manager import (get_os_states, plan_tiles, tile_grid, RateBudget, STATE_FIELDS,
+                             OpenSkyClient, CircuitBreaker, SnapshotStore, UpstreamError)
+
+# to run: pytest test_opensky_manager.py
+
+
+def make_state(icao24, lng, lat, last_contact=1738361582):
+    values = [icao24, "TEST123 ", "United States", last_contact, last_contact, lng, lat, 1000.0,
+              False, 100.0, 90.0, 0, None, 1000.0, "1200", False, 0, 0]
+    return SimpleNamespace(**dict(zip(STATE_FIELDS, values)))
+
+
+class StubApi:
+    """Local stand-in for OpenSkyApi serving a fixed list of aircraft."""
+
+    def __init__(self, states, fail_tiles=(), time=1738361582):
+        self.states = states
+        self.time = time
+        self.fail_tiles = fail_tiles
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def get_states(self, bbox):
+        with self.lock:
+            self.calls.append(bbox)
+        if bbox in self.fail_tiles:
+            raise ConnectionError("stub failure")
+        min_lat, max_lat, min_lng, max_lng = bbox
+        inside = [s for s in self.states
+                  if min_lat <= s.latitude <= max_lat and min_lng <= s.longitude <= max_lng]
+        return SimpleNamespace(time=self.time, states=inside)
+
+
+def test_plan_tiles_covers_region():
+    """Test that large boxes are split into equal tiles within the size limit."""
+    tiles = plan_tiles([20.0, 50.0, -130.0, -60.0])
+
+    assert tile_grid([20.0, 50.0, -130.0, -60.0]) == (3, 7)
+    assert len(tiles) == 21
+    for t in tiles:
+        assert t[1] - t[0] <= 10.0 and t[3] - t[2] <= 10.0
+    assert min(t[0] for t in tiles) == 20.0 and max(t[1] for t in tiles) == 50.0
+    assert plan_tiles([34.0, 35.0, -118.0, -117.0]) == [[34.0, 35.0, -118.0, -117.0]]
+
+
+def test_large_region_merged_and_deduplicated():
+    """Test that tiles are fetched separately and edge aircraft appear once."""
+    api = StubApi([
+        make_state("aaaaaa", -115.0, 35.0),
+        make_state("bbbbbb", -95.0, 45.0),
+        make_state("cccccc", -110.0, 40.0),  # on the shared tile corner
+    ])
+
+    data = json.loads(get_os_states([30.0, 50.0, -120.0, -90.0], api=api, snapshots=SnapshotStore()))
+
+    assert len(api.calls) == 6
+    icaos = sorted(f["properties"]["icao24"] for f in data["features"])
+    assert icaos == ["aaaaaa", "bbbbbb", "cccccc"]
+
+
+def test_failed_tile_keeps_other_tiles():
+    """Test that one failing tile does not drop the rest of the region."""
+    api = StubApi([make_state("aaaaaa", -115.0, 35.0), make_state("bbbbbb", -95.0, 45.0)],
+                  fail_tiles=[(40.0, 50.0, -100.0, -90.0)])
+
+    data = json.loads(get_os_states([30.0, 50.0, -120.0, -90.0], api=api, snapshots=SnapshotStore()))
+
+    assert [f["properties"]["icao24"] for f in data["features"]] == ["aaaaaa"]
+    assert "stale" not in data
+    assert data["partial"] is True  # the failed tile had no snapshot to fill in
+
+
+def test_rate_budget_limits_burst():
+    """Test that the token bucket refuses calls beyond the burst until it refills."""
+    now = [0.0]
+    budget = RateBudget(rate=1.0, burst=2, clock=lambda: now[0])
+
+    assert budget.acquire(timeout=0)
+    assert budget.acquire(timeout=0)
+    assert not budget.acquire(timeout=0)
+    now[0] = 1.0
+    assert budget.acquire(timeout=0)
+
+
+def test_rate_budget_shared_through_file(tmp_path):
+    """Test that budgets on one state file (one per worker) draw from a single bucket."""
+    now = [0.0]
+    path = str(tmp_path / "opensky_rate")
+    worker_a = RateBudget(rate=1.0, burst=2, clock=lambda: now[0], path=path)
+    worker_b = RateBudget(rate=1.0, burst=2, clock=lambda: now[0], path=path)
+
+    assert worker_a.acquire(timeout=0)
+    assert worker_b.acquire(timeout=0)
+    assert not worker_a.acquire(timeout=0)
+    assert not worker_b.acquire(timeout=0)
+    now[0] = 1.0
+    assert worker_b.acquire(timeout=0)
+
+
+class FakeResponse:
+    def __init__(self, status_code, payload=None):
+        self.status_code = status_code
+        self.payload = payload
+
+    def json(self):
+        return self.payload
+
+
+class FakeSession:
+    """Returns (or raises) the queued results in order."""
+
+    def __init__(self, results):
+        self.results = list(results)
+        self.calls = 0
+
+    def get(self, url, params=None, timeout=None):
+        self.calls += 1
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+STATES_PAYLOAD = {"time": 1738361582, "states": [
+    ["aaaaaa", "TEST123 ", "United States", 1738361582, 1738361582, -118.5, 34.5, 1000.0,
+     False, 100.0, 90.0, 0, None, 1000.0, "1200", False, 0, 0]]}
+
+
+def test_client_retries_then_succeeds():
+    """Test that timeouts and 5xx answers are retried within the deadline."""
+    session = FakeSession([requests.Timeout("slow"), FakeResponse(503), FakeResponse(200, STATES_PAYLOAD)])
+    client = OpenSkyClient(session=session, backoff=0.001)
+
+    states = client.get_states(bbox=(34.0, 35.0, -119.0, -118.0))
+
+    assert session.calls == 3
+    assert states.states[0].icao24 == "aaaaaa"
+
+
+def test_client_circuit_opens():
+    """Test that repeated failures stop upstream calls until the breaker resets."""
+    session = FakeSession([FakeResponse(400)] * 3)
+    client = OpenSkyClient(session=session, breaker=CircuitBreaker(threshold=2, reset_after=60))
+
+    for _ in range(2):
+        with pytest.raises(UpstreamError):
+            client.get_states(bbox=(34.0, 35.0, -119.0, -118.0))
+    with pytest.raises(UpstreamError, match="circuit open"):
+        client.get_states(bbox=(34.0, 35.0, -119.0, -118.0))
+
+    assert session.calls == 2
+
+
+def test_stale_snapshot_served_when_upstream_fails():
+    """Test that the last good snapshot, clipped to the bbox, is served marked stale."""
+    import time
+    now = int(time.time())
+    snapshots = SnapshotStore()
+    api = StubApi([make_state("aaaaaa", -118.5, 34.5, now), make_state("bbbbbb", -110.0, 40.0, now)], time=now)
+    get_os_states([30.0, 40.0, -120.0, -110.0], api=api, snapshots=snapshots)
+
+    failing = StubApi([], fail_tiles=[(34.0, 35.0, -119.0, -118.0)])
+    data = json.loads(get_os_states([34.0, 35.0, -119.0, -118.0], api=failing, snapshots=snapshots))
+
+    assert data["stale"] is True
+    assert [f["properties"]["icao24"] for f in data["features"]] == ["aaaaaa"]
+
+    # no snapshot for this area
+    assert get_os_states([34.0, 35.0, -119.0, -118.0], api=failing, snapshots=SnapshotStore()) is None
+
+
+def test_stale_aircraft_keep_their_snapshot_time():
+    """Test that aircraft filled in from a snapshot are not stamped with the fresh time."""
+    import time
+    old = int(time.time()) - 60
+    snapshots = SnapshotStore()
+    get_os_states([30.0, 50.0, -120.0, -110.0], snapshots=snapshots,
+                  api=StubApi([make_state("aaaaaa", -115.0, 35.0, old), make_state("bbbbbb", -115.0, 45.0, old)],
+                              time=old))
+
+    api = StubApi([make_state("aaaaaa", -115.0, 35.0, old + 60)], time=old + 60,
+                  fail_tiles=[(40.0, 50.0, -120.0, -110.0)])
+    data = json.loads(get_os_states([30.0, 50.0, -120.0, -110.0], api=api, snapshots=snapshots))
+
+    stamps = {f["properties"]["icao24"]: f["properties"]["timestamp"] for f in data["features"]}
+    assert stamps["aaaaaa"] == time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(old + 60))
+    assert stamps["bbbbbb"] == time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(old))
+    assert data["stale"] is True and data["snapshot_time"] == old
+    assert "partial" not in data
+
+
+def test_client_attempts_end_by_deadline():
+    """Test that a retry is not started, nor given a full timeout, past the deadline."""
+    import time
+    timeouts = []
+
+    class SlowSession(FakeSession):
+        def get(self, url, params=None, timeout=None):
+            timeouts.append(timeout)
+            time.sleep(0.05)
+            raise requests.Timeout("slow")
+
+    client = OpenSkyClient(session=SlowSession([]), backoff=0.001, retries=10)
+    start = time.monotonic()
+
+    with pytest.raises(UpstreamError):
+        client.get_states(bbox=(34.0, 35.0, -119.0, -118.0), deadline=start + 0.12)
+
+    assert time.monotonic() - start < 0.3
+    assert all(read <= 0.12 for _, read in timeouts)
+
+
+def test_rate_budget_wait_counts_against_deadline():
+    """Test that a tile gives up on the rate budget at the region deadline."""
+    import time
+    from opensky_manager import fetch_tile
+
+    budget = RateBudget(rate=0.01, burst=1)
+    budget.acquire(timeout=0)
+    start = time.monotonic()
+
+    with pytest.raises(UpstreamError, match="rate budget"):
+        fetch_tile(StubApi([]), [34.0, 35.0, -119.0, -118.0], budget=budget, deadline=start + 0.1)
+    assert time.monotonic() - start < 0.5
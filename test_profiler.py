@@ -0,0 +1,39 @@
+import cProfile
+from profiler import ProfileStore
+
+# to run: pytest test_profiler.py
+
+
+def make_profile():
+    profile = cProfile.Profile()
+    profile.enable()
+    sorted(range(1000), reverse=True)
+    profile.disable()
+    return profile
+
+
+def test_ring_buffer_keeps_newest(tmp_path):
+    """Test that only the newest profiles are kept on disk."""
+    now = [1745014394.0]
+    store = ProfileStore(str(tmp_path), keep=2, clock=lambda: now[0])
+
+    names = []
+    for i in range(3):
+        now[0] += 1
+        names.append(store.save(make_profile(), "GET", f"/route-{i}/<date>", 1.5))
+
+    listed = store.list()
+    assert [p["name"] for p in listed] == [names[2], names[1]]
+    assert listed[0]["route"] == "route-2-date"
+    assert listed[0]["duration_ms"] == 1500
+    assert store.path(names[0]) is None
+
+
+def test_summary_and_path_validation(tmp_path):
+    """Test that stored profiles can be summarized and other names are rejected."""
+    store = ProfileStore(str(tmp_path))
+    name = store.save(make_profile(), "GET", "/get-date-range", 0.2)
+
+    assert "cumulative" in store.summary(name)
+    assert store.path("../flask_app.py") is None
+    assert store.summary("missing.prof") is None
@@ -0,0 +1,65 @@
+import json
+from replay_manager import FixtureSource, ReplaySource
+
+# to run: pytest test_replay_manager.py
+
+
+def make_state(icao24, lng, lat):
+    return [icao24, "TEST123 ", "United States", 1738361582, 1738361582, lng, lat, 1000.0,
+            False, 100.0, 90.0, 0, None, 1000.0, "1200", False, 0]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_fixture_source_matches_file():
+    """Test that /get-data fixture bytes hold the same features as the file."""
+    source = FixtureSource("dataframe.geojson")
+    body = source.body()
+
+    with open("dataframe.geojson") as f:
+        expected = json.load(f)
+
+    assert json.loads(body)["features"] == expected["features"]
+    assert source.body() is body  # parsed once
+
+
+def test_replay_filters_bbox_like_opensky():
+    """Test that replayed states are converted like get_os_states and clipped to the bbox."""
+    source = ReplaySource("opensky.json")
+    data = json.loads(source.get_states([34.0, 40.0, -100.0, -90.0]))
+
+    assert data["type"] == "FeatureCollection"
+    assert len(data["features"]) > 0
+    for feature in data["features"]:
+        props = feature["properties"]
+        assert 34.0 <= props["latitude"] <= 40.0
+        assert -100.0 <= props["longitude"] <= -90.0
+        assert "squawk" not in props
+        assert props["timestamp"] == "2025-01-31 22:13:02"
+
+
+def test_replay_advances_with_speed(tmp_path):
+    """Test that snapshots advance with the scaled clock and loop at the end."""
+    path = tmp_path / "dumps.jsonl"
+    with open(path, "w") as f:
+        f.write(json.dumps({"time": 1000, "states": [make_state("aaaaaa", -90.5, 35.5)]}) + "\n")
+        f.write(json.dumps({"time": 1010, "states": [make_state("bbbbbb", -90.5, 35.5)]}) + "\n")
+
+    clock = FakeClock()
+    source = ReplaySource(str(path), speed=10.0, clock=clock)
+    bbox = [35.0, 36.0, -91.0, -90.0]
+
+    def current_icao():
+        return json.loads(source.get_states(bbox))["features"][0]["properties"]["icao24"]
+
+    assert current_icao() == "aaaaaa"
+    clock.now = 1.0  # 10 recorded seconds
+    assert current_icao() == "bbbbbb"
+    clock.now = 2.0  # past the end, loops
+    assert current_icao() == "aaaaaa"
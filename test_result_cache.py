@@ -0,0 +1,117 @@
+from unittest.mock import patch
+from result_cache import ResultCache
+
+# to run: pytest test_result_cache.py
+
+PAST_KEY = ("2025-04-18", "22:13:14", 1, None)
+TODAY = "2025-04-26"
+TODAY_KEY = (TODAY, "12:00:00", 1, None)
+
+
+def test_hit_and_miss_counters():
+    """Test that a stored body is returned and counted as a hit."""
+    cache = ResultCache()
+
+    assert cache.get(PAST_KEY) is None
+    cache.put(PAST_KEY, b"[]")
+    assert cache.get(PAST_KEY) == b"[]"
+
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1
+    assert stats["bytes"] == 2
+
+
+def test_lru_eviction_by_bytes():
+    """Test that the least recently used bodies are dropped past the memory budget."""
+    cache = ResultCache(max_bytes=10)
+    cache.put(("2025-04-18", "a", 1, None), b"12345")
+    cache.put(("2025-04-18", "b", 1, None), b"12345")
+    cache.get(("2025-04-18", "a", 1, None))
+    cache.put(("2025-04-18", "c", 1, None), b"12345")
+
+    assert cache.get(("2025-04-18", "b", 1, None)) is None
+    assert cache.get(("2025-04-18", "a", 1, None)) == b"12345"
+    assert cache.stats()["bytes"] == 10
+
+
+@patch("result_cache.utc_today", return_value=TODAY)
+def test_invalidate_only_touches_that_day(mock_today):
+    """Test that new inserts drop current-day entries and keep completed days."""
+    cache = ResultCache()
+    cache.put(PAST_KEY, b"past")
+    cache.put(TODAY_KEY, b"today")
+
+    cache.invalidate_date(TODAY)
+
+    assert cache.get(TODAY_KEY) is None
+    assert cache.get(PAST_KEY) == b"past"
+
+
+@patch("result_cache.utc_today", return_value=TODAY)
+def test_disk_store_shared_between_workers(mock_today, tmp_path):
+    """Test that workers share entries and invalidations through the sqlite store."""
+    store = str(tmp_path / "results.sqlite")
+    worker_a = ResultCache(store_path=store)
+    worker_b = ResultCache(store_path=store)
+
+    worker_a.put(PAST_KEY, b"past")
+    worker_a.put(TODAY_KEY, b"today")
+    assert worker_b.get(PAST_KEY) == b"past"
+    assert worker_b.get(TODAY_KEY) == b"today"
+    assert worker_b.stats()["disk_hits"] == 2
+
+    # worker A inserts new documents for today, B's memory copy is now stale
+    worker_a.invalidate_date(TODAY)
+    assert worker_b.get(TODAY_KEY) is None
+    assert worker_b.get(PAST_KEY) == b"past"
+
+
+@patch("result_cache.utc_today", return_value=TODAY)
+def test_put_dropped_after_concurrent_insert(mock_today):
+    """Test that a body queried before an insert is not stored under the new generation."""
+    cache = ResultCache()
+
+    assert cache.get(TODAY_KEY) is None  # query starts
+    cache.invalidate_date(TODAY)  # documents inserted meanwhile
+    cache.put(TODAY_KEY, b"before insert")
+
+    assert cache.get(TODAY_KEY) is None
+    cache.put(TODAY_KEY, b"after insert")
+    assert cache.get(TODAY_KEY) == b"after insert"
+
+
+@patch("result_cache.utc_today", return_value=TODAY)
+def test_current_day_expires_without_store(mock_today):
+    """Test that without a shared store, current-day entries are only kept for today_ttl."""
+    now = [0.0]
+    cache = ResultCache(today_ttl=10, clock=lambda: now[0])
+    cache.put(PAST_KEY, b"past")
+    cache.put(TODAY_KEY, b"today")
+
+    now[0] = 11.0
+
+    assert cache.get(TODAY_KEY) is None
+    assert cache.get(PAST_KEY) == b"past"
+
+
+def test_variants_kept_with_body():
+    """Test that derived values (e.g. gzip bodies) are computed once and dropped with the entry."""
+    cache = ResultCache(max_bytes=100)
+    cache.put(PAST_KEY, b"x" * 20)
+    body = cache.get(PAST_KEY)
+    calls = []
+
+    def make():
+        calls.append(1)
+        return b"z" * 10
+
+    assert cache.variant(PAST_KEY, body, "gzip", make) == b"z" * 10
+    assert cache.variant(PAST_KEY, body, "gzip", make) == b"z" * 10
+    assert len(calls) == 1
+    assert cache.stats()["bytes"] == 30
+
+    # a replaced body does not reuse the old variant
+    cache.put(PAST_KEY, b"y" * 20)
+    assert cache.stats()["bytes"] == 20
+    assert cache.variant(PAST_KEY, cache.get(PAST_KEY), "gzip", make) == b"z" * 10
+    assert len(calls) == 2
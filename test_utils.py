@@ -0,0 +1,80 @@
+import math
+import pytest
+from datetime import datetime
+from utils import convert_timestamp, normalize_timestamps
+
+hypothesis = pytest.importorskip("hypothesis")
+from hypothesis import given, settings, strategies as st
+
+# to run: pytest test_utils.py
+
+datetimes = st.datetimes(min_value=datetime(1, 1, 1), max_value=datetime(9999, 12, 31, 23, 59, 59, 999999))
+
+timestamps = st.one_of(
+    st.none(),
+    st.booleans(),
+    st.integers(min_value=-2 ** 40, max_value=2 ** 40),
+    st.integers(),
+    # beyond int64, where numpy switches to uint64 or float64
+    st.integers(min_value=2 ** 63 - 2 ** 16, max_value=2 ** 64 + 2 ** 16),
+    st.integers(min_value=-2 ** 63 - 2 ** 16, max_value=-2 ** 63 + 2 ** 16),
+    st.floats(min_value=-7e10, max_value=3e11),
+    st.floats(allow_nan=True, allow_infinity=True),
+    datetimes.map(lambda dt: dt.strftime("%Y-%m-%d %H:%M:%S")),
+    datetimes.map(lambda dt: dt.isoformat()),
+    datetimes.map(lambda dt: dt.isoformat() + "Z"),
+    datetimes.map(lambda dt: dt.isoformat(timespec="microseconds") + "Z"),
+    # right shape, possibly impossible dates (month 13, Feb 30, 24:60:61)
+    st.from_regex(r"\A\d{4}-[01]\d-[0-3]\d[T ][0-2]\d:[0-6]\d:[0-6]\d(\.\d{6})?Z?\Z"),
+    st.text(max_size=30),
+)
+
+
+def same(a, b):
+    return a == b or (isinstance(a, float) and isinstance(b, float) and math.isnan(a) and math.isnan(b))
+
+
+@settings(max_examples=500)
+@given(st.lists(timestamps, max_size=40))
+def test_matches_convert_timestamp(values):
+    """Test that the batch output equals convert_timestamp value for value."""
+    normalized, _ = normalize_timestamps(values)
+
+    assert len(normalized) == len(values)
+    for value, result in zip(values, normalized):
+        assert same(result, convert_timestamp(value)), value
+
+
+@given(st.lists(st.one_of(st.integers(min_value=0, max_value=253402300799),
+                         st.integers(min_value=2 ** 63 - 2 ** 16, max_value=2 ** 64 - 1)), min_size=1, max_size=10))
+def test_integers_only_batches_match(values):
+    """Test batches of ints only, which numpy would store as uint64 past 2**63."""
+    normalized, _ = normalize_timestamps(values)
+
+    assert normalized == [convert_timestamp(v) for v in values]
+
+
+@settings(max_examples=300)
+@given(st.lists(timestamps, max_size=40))
+def test_invalid_entries_are_unchanged(values):
+    """Test that reported entries are the unparseable ones, returned as is."""
+    normalized, invalid = normalize_timestamps(values)
+
+    for i, (value, result) in enumerate(zip(values, normalized)):
+        if i in invalid:
+            assert result is value
+        elif value is not None:
+            assert isinstance(result, str) and result.endswith("Z")
+
+
+def test_invalid_positions_reported_in_order():
+    """Test that invalid entries are reported once, by position."""
+    values = ["not a time", 1745014394, None, "2025-13-01 00:00:00", float("nan"), {"t": 1}, 2 ** 64 - 1000]
+
+    normalized, invalid = normalize_timestamps(values)
+
+    assert invalid == [0, 3, 4, 5, 6]
+    assert normalized[6] == 2 ** 64 - 1000
+    assert normalize_timestamps([2 ** 64 - 1000]) == ([2 ** 64 - 1000], [0])
+    assert normalized[1] == "2025-04-18T22:13:14Z"
+    assert normalized[2] is None
@@ -1,4 +1,5 @@
 from datetime import datetime
+import numpy as np
 
 def convert_timestamp(value):
     """Convert a timestamp (string or number) to ISO 8601 UTC string."""
@@ -33,4 +34,168 @@ def convert_timestamp(value):
 
     except Exception as e:
         print(f"Error converting timestamp: {e}")
-        return value  # Return original value in case of unexpected error
\ No newline at end of file
+        return value  # Return original value in case of unexpected error
+
+# datetime range as unix seconds: 0001-01-01T00:00:00 .. 9999-12-31T23:59:59
+MIN_UNIX_SECONDS = -62135596800
+MAX_UNIX_SECONDS = 253402300799
+DAYS_IN_MONTH = np.array([0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+# 'YYYY-MM-DD?HH:MM:SS' with optional '.ffffff' and 'Z', the only string shapes
+# parsed in bulk; anything else goes through the scalar path
+DIGIT_COLUMNS = [0, 1, 2, 3, 5, 6, 8, 9, 11, 12, 14, 15, 17, 18]
+FRACTION_COLUMNS = list(range(20, 26))
+STRING_WIDTH = 27
+
+
+def normalize_timestamps(values):
+    """
+    Batch version of convert_timestamp.
+
+    Unix timestamps and fixed-width 'YYYY-MM-DD HH:MM:SS' / ISO 8601 strings are
+    parsed with numpy in one pass per kind; other strings fall back to the same
+    parsing convert_timestamp does. Output matches convert_timestamp value for
+    value, without printing on errors.
+
+    Args:
+        values (iterable): Timestamps (numbers, strings or None), e.g. a list,
+            numpy object array or pandas Series.
+
+    Returns:
+        (normalized, invalid): list of ISO 8601 UTC strings aligned with values,
+        with unparseable entries returned unchanged, and the positions of those
+        entries. None values are passed through and not counted as invalid.
+    """
+    values = list(values)
+    normalized = list(values)
+    invalid = []
+
+    ints, floats, strings = [], [], []
+    for i, value in enumerate(values):
+        if value is None:
+            continue
+        if isinstance(value, int):
+            ints.append(i)
+        elif isinstance(value, float):
+            floats.append(i)
+        elif isinstance(value, str):
+            strings.append(i)
+        else:
+            invalid.append(i)
+
+    _normalize_unix(values, ints, normalized, invalid)
+    _normalize_unix(values, floats, normalized, invalid)
+    fallback = _normalize_strings(values, strings, normalized)
+
+    for i in fallback:
+        try:
+            normalized[i] = _parse_timestamp(values[i])
+        except (ValueError, OverflowError, OSError):
+            invalid.append(i)
+
+    invalid.sort()
+    return normalized, invalid
+
+
+def _parse_timestamp(value):
+    """convert_timestamp for one number or string, raising instead of returning value."""
+    if isinstance(value, (int, float)):
+        return datetime.utcfromtimestamp(value).isoformat() + "Z"
+    if " " in value and len(value) == 19:
+        return datetime.strptime(value, "%Y-%m-%d %H:%M:%S").isoformat() + "Z"
+    return datetime.fromisoformat(value.replace("Z", "")).isoformat() + "Z"
+
+
+def _normalize_unix(values, indices, normalized, invalid):
+    """
+    Convert unix timestamps at indices (all ints or all floats) in bulk. Rounds
+    fractions to microseconds half-to-even like datetime.utcfromtimestamp.
+    """
+    if not indices:
+        return
+    if isinstance(values[indices[0]], float):
+        raw = np.array([values[i] for i in indices], dtype=np.float64)
+        seconds, fraction = np.modf(raw)[::-1]
+        with np.errstate(invalid="ignore"):
+            micros = np.rint(fraction * 1e6)
+            seconds = seconds + (micros >= 1e6) - (micros < 0)
+            micros = micros - 1e6 * (micros >= 1e6) + 1e6 * (micros < 0)
+            valid = np.isfinite(raw) & (seconds >= MIN_UNIX_SECONDS) & (seconds <= MAX_UNIX_SECONDS)
+        seconds = np.where(valid, seconds, 0).astype(np.int64)
+        micros = np.where(valid, micros, 0).astype(np.int64)
+    else:
+        # range check on the Python ints, numpy would wrap or round values beyond int64
+        in_range = [MIN_UNIX_SECONDS <= values[i] <= MAX_UNIX_SECONDS for i in indices]
+        valid = np.array(in_range, dtype=bool)
+        seconds = np.array([values[i] if ok else 0 for i, ok in zip(indices, in_range)], dtype=np.int64)
+        micros = np.zeros_like(seconds)
+
+    stamps = (seconds * 1_000_000 + micros).astype("datetime64[us]")
+    text = np.where(micros == 0,
+                    np.datetime_as_string(stamps, unit="s"),
+                    np.datetime_as_string(stamps, unit="us"))
+    for i, ok, iso in zip(indices, valid.tolist(), text.tolist()):
+        if ok:
+            normalized[i] = iso + "Z"
+        else:
+            invalid.append(i)
+
+
+def _normalize_strings(values, indices, normalized):
+    """
+    Convert fixed-width date-time strings at indices in bulk by validating their
+    characters as a code point matrix. Returns indices of strings with any other
+    shape, which need the scalar path.
+    """
+    if not indices:
+        return []
+    lengths = np.array([len(values[i]) for i in indices])
+    shaped = np.isin(lengths, (19, 20, 26, 27))
+    candidates = [i for i, ok in zip(indices, shaped.tolist()) if ok]
+    fallback = [i for i, ok in zip(indices, shaped.tolist()) if not ok]
+    if not candidates:
+        return fallback
+
+    lengths = lengths[shaped]
+    chars = np.array([values[i] for i in candidates], dtype=f"U{STRING_WIDTH}")
+    codes = chars.view(np.uint32).reshape(len(candidates), STRING_WIDTH).astype(np.int64)
+    digits = codes - ord("0")
+
+    def is_char(column, char):
+        return codes[:, column] == ord(char)
+
+    has_fraction = lengths >= 26
+    has_z = (lengths == 20) | (lengths == 27)
+    shape_ok = (
+        np.all((digits[:, DIGIT_COLUMNS] >= 0) & (digits[:, DIGIT_COLUMNS] <= 9), axis=1)
+        & is_char(4, "-") & is_char(7, "-") & is_char(13, ":") & is_char(16, ":")
+        & (is_char(10, "T") | is_char(10, " "))
+        & np.where(has_fraction,
+                   is_char(19, ".") & np.all((digits[:, FRACTION_COLUMNS] >= 0)
+                                             & (digits[:, FRACTION_COLUMNS] <= 9), axis=1),
+                   True)
+        & np.where(has_z, codes[np.arange(len(candidates)), lengths - 1] == ord("Z"), True)
+    )
+
+    def field(start, width):
+        value = np.zeros(len(candidates), dtype=np.int64)
+        for column in range(start, start + width):
+            value = value * 10 + np.clip(digits[:, column], 0, 9)
+        return value
+
+    year, month, day = field(0, 4), field(5, 2), field(8, 2)
+    hour, minute, second = field(11, 2), field(14, 2), field(17, 2)
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    month_days = DAYS_IN_MONTH[np.clip(month, 0, 12)] + (leap & (month == 2))
+    date_ok = ((year >= 1) & (month >= 1) & (month <= 12) & (day >= 1) & (day <= month_days)
+               & (hour <= 23) & (minute <= 59) & (second <= 59))
+    valid = shape_ok & date_ok
+
+    # isoformat drops a zero fraction
+    keep_fraction = has_fraction & (field(20, 6) != 0)
+    for i, ok, text, fraction in zip(candidates, valid.tolist(), chars.tolist(), keep_fraction.tolist()):
+        if ok:
+            normalized[i] = text[:10] + "T" + text[11:26 if fraction else 19] + "Z"
+        else:
+            fallback.append(i)
+    return fallback
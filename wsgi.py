@@ -0,0 +1,11 @@
+"""
+Production entry point.
+
+to run: gunicorn -c gunicorn.conf.py wsgi:app
+
+gunicorn is in environment.yaml (pip section, not on Windows); in an existing
+environment: pip install gunicorn==23.0.0
+"""
+from flask_app import create_app
+
+app = create_app()